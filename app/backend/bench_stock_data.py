@@ -0,0 +1,70 @@
+"""Benchmark /stock-data response encoding: pydantic path vs. direct array path
+
+Usage: python bench_stock_data.py [bars] [runs]
+
+Encodes a synthetic series of minute bars (default: one year, ~98k bars) both
+ways, checks the bodies are byte-identical and prints p50/p99 latency and
+CPU time per request.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from main import StockDataResponse, calculate_regression, render_json, stock_data_fields
+
+
+def make_series(bars: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-02 09:30", periods=bars, freq="1min", tz="America/New_York")
+    close = 100 + np.cumsum(rng.normal(0, 0.05, bars))
+    return pd.DataFrame({
+        "Open": close, "High": close + 0.1, "Low": close - 0.1, "Close": close,
+        "Volume": rng.integers(100, 10000, bars),
+    }, index=index)
+
+
+def legacy_body(data: pd.DataFrame, show_regression: bool) -> bytes:
+    """The previous path: per-element lists, model validation, jsonable_encoder, JSONResponse"""
+    timestamps = [int(ts.timestamp()) for ts in data.index]
+    prices = data["Close"].tolist()
+    volume = data["Volume"].tolist()
+    regression_data, error_margin = None, None
+    if show_regression:
+        regression_data, error_margin = calculate_regression(prices)
+    response = StockDataResponse(
+        timestamps=timestamps, prices=prices, regression_data=regression_data,
+        volume=volume, error_margin=error_margin,
+    )
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def fast_body(data: pd.DataFrame, show_regression: bool) -> bytes:
+    return render_json(stock_data_fields(data, show_regression)).body
+
+
+def measure(fn, data, show_regression, runs):
+    wall, cpu = [], []
+    for _ in range(runs):
+        w, c = time.perf_counter(), time.process_time()
+        fn(data, show_regression)
+        wall.append(time.perf_counter() - w)
+        cpu.append(time.process_time() - c)
+    return np.percentile(wall, [50, 99]) * 1000, np.mean(cpu) * 1000
+
+
+def main(bars: int = 98_280, runs: int = 50):
+    data = make_series(bars)
+    for show_regression in (False, True):
+        assert legacy_body(data, show_regression) == fast_body(data, show_regression)
+        print(f"{bars} bars, show_regression={show_regression}")
+        for name, fn in (("pydantic", legacy_body), ("direct", fast_body)):
+            (p50, p99), cpu = measure(fn, data, show_regression, runs)
+            print(f"  {name:<9} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   cpu {cpu:8.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,108 @@
+"""Compact binary columnar encoding for series responses
+
+Layout (all integers little-endian):
+
+    magic        4 bytes  b"TTC1"
+    columns      uint32
+    per column:  uint16 name length, name (utf-8), 3-byte dtype ("<i8" or "<f8"), uint64 length
+    padding      zero bytes up to a multiple of 8
+    buffers      each column's raw values, in header order
+
+Every dtype is 8 bytes wide, so all buffers stay 8-byte aligned and can be
+viewed in place by the client (``np.frombuffer`` or a JS ``Float64Array``).
+"""
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+MEDIA_TYPE = "application/vnd.trendtrader.columnar"
+MAGIC = b"TTC1"
+DTYPES = {"i": "<i8", "u": "<i8", "b": "<i8", "f": "<f8"}
+
+
+def encode_columns(columns: Dict[str, np.ndarray]) -> bytes:
+    """Encode named 1-D arrays; integer columns become int64, floating ones float64"""
+    arrays = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if values.dtype.kind not in DTYPES:
+            raise ValueError(f"Unsupported dtype for column {name}: {values.dtype}")
+        arrays[name] = np.ascontiguousarray(values.reshape(-1), dtype=DTYPES[values.dtype.kind])
+
+    header = [MAGIC, struct.pack("<I", len(arrays))]
+    for name, values in arrays.items():
+        encoded = name.encode()
+        header.append(struct.pack("<H", len(encoded)) + encoded + values.dtype.str.encode())
+        header.append(struct.pack("<Q", len(values)))
+    header = b"".join(header)
+    header += b"\0" * (-len(header) % 8)
+    return header + b"".join(values.tobytes() for values in arrays.values())
+
+
+def decode_columns(payload: bytes) -> Dict[str, np.ndarray]:
+    """Inverse of encode_columns; the arrays are read-only views into payload"""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a columnar payload")
+    (count,) = struct.unpack_from("<I", payload, 4)
+    offset = 8
+    layout = []
+    for _ in range(count):
+        (name_length,) = struct.unpack_from("<H", payload, offset)
+        offset += 2
+        name = payload[offset:offset + name_length].decode()
+        offset += name_length
+        dtype = payload[offset:offset + 3].decode()
+        (length,) = struct.unpack_from("<Q", payload, offset + 3)
+        offset += 11
+        layout.append((name, dtype, length))
+
+    offset += -offset % 8
+    columns = {}
+    for name, dtype, length in layout:
+        columns[name] = np.frombuffer(payload, dtype=dtype, count=length, offset=offset)
+        offset += length * 8
+    return columns
+
+
+def _accept_quality(accept: str) -> Dict[str, float]:
+    """Map each media range in an Accept header to its q-value"""
+    qualities = {}
+    for item in (accept or "").split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        qualities[media_range] = max(q, qualities.get(media_range, 0.0))
+    return qualities
+
+
+def _quality_for(qualities: Dict[str, float], media_type: str) -> Optional[float]:
+    """q-value of the most specific range matching media_type, or None if none matches"""
+    major = media_type.split("/")[0]
+    for media_range in (media_type, f"{major}/*", "*/*"):
+        if media_range in qualities:
+            return qualities[media_range]
+    return None
+
+
+def accepts_columnar(accept: str) -> bool:
+    """Whether an Accept header asks for the columnar format
+
+    The format has to be named explicitly (wildcards keep getting JSON) with a
+    non-zero q-value, and must not be ranked below JSON.
+    """
+    qualities = _accept_quality(accept)
+    columnar = qualities.get(MEDIA_TYPE, 0.0)
+    if columnar <= 0.0:
+        return False
+    json = _quality_for(qualities, "application/json")
+    return json is None or columnar >= json
@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class DataAccessTimeout(Exception):
+    """Raised when a provider call does not finish within its timeout"""
+
+
+class DataAccessOverloaded(Exception):
+    """Raised when too many provider calls are already queued"""
+
+
+class AsyncDataAccess:
+    """Run blocking market-data calls in a bounded thread pool
+
+    Coroutines await ``run`` instead of calling providers inline, so a slow
+    upstream request only occupies a worker thread and never the event loop.
+    At most ``max_pending`` calls may be running or queued at once; each call
+    is bounded by a timeout, and a call that times out or whose caller is
+    cancelled is dropped from the queue if it has not started yet. A call that
+    already started keeps counting as pending until its thread finishes, so
+    abandoned calls still hold back new ones.
+    """
+
+    def __init__(self, max_workers: int = 8, max_pending: int = 64, timeout: float = 15.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="market-data")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise DataAccessOverloaded(f"{self._pending} market data calls already pending")
+            self._pending += 1
+
+        try:
+            call = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Runs when the thread finishes, or when the call is dropped from the queue
+        call.add_done_callback(self._release)
+        try:
+            # wait_for cancels the wrapped future on timeout or caller cancellation,
+            # which removes the call from the queue if no worker has picked it up yet
+            result = await asyncio.wait_for(asyncio.wrap_future(call), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise DataAccessTimeout(f"{getattr(fn, '__name__', 'call')} timed out")
+        self.completed += 1
+        return result
+
+    def _release(self, _call: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,364 @@
+"""Stateful indicators updated in O(1) per appended bar
+
+Each indicator keeps only the state its recurrence needs (running sums,
+EMA values, Wilder averages, monotonic deques) and produces the same values
+as the vectorized functions in ``indicators.py``. State round-trips through
+plain JSON-compatible dicts so it can be persisted and restored.
+``LiveIndicators`` keeps the sets fed by live streams and saves them to disk.
+"""
+import json
+import math
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+NAN = float("nan")
+
+
+class Indicator(ABC):
+    """Base class; subclasses list their serializable attributes in ``fields``"""
+
+    name = "indicator"
+    fields: tuple = ()
+
+    @abstractmethod
+    def update(self, close: float, high: Optional[float] = None, low: Optional[float] = None):
+        """Account for the next bar and return the indicator's value(s) at it"""
+
+    def to_state(self) -> Dict[str, Any]:
+        state = {"type": self.name}
+        for field in self.fields:
+            value = getattr(self, field)
+            if isinstance(value, deque):
+                value = list(value)
+            elif isinstance(value, Indicator):
+                value = value.to_state()
+            state[field] = value
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Indicator":
+        indicator = cls.__new__(cls)
+        for field in cls.fields:
+            value = state[field]
+            if isinstance(value, dict) and "type" in value:
+                value = indicator_from_state(value)
+            elif isinstance(value, list):
+                value = deque(tuple(v) if isinstance(v, list) else v for v in value)
+            setattr(indicator, field, value)
+        return indicator
+
+
+class SMA(Indicator):
+    name = "sma"
+    fields = ("period", "window", "total")
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, close, high=None, low=None):
+        self.window.append(close)
+        self.total += close
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        return self.total / self.period if len(self.window) == self.period else NAN
+
+
+class EMA(Indicator):
+    """Seeded with the first value, alpha = 2 / (period + 1)"""
+
+    name = "ema"
+    fields = ("alpha", "value")
+
+    def __init__(self, period: int = 20, alpha: Optional[float] = None):
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, close, high=None, low=None):
+        if self.value is None:
+            self.value = close
+        else:
+            self.value += self.alpha * (close - self.value)
+        return self.value
+
+
+class MACD(Indicator):
+    name = "macd"
+    fields = ("fast", "slow", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close, high=None, low=None):
+        line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(line)
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+
+class RSI(Indicator):
+    """Wilder's RSI: simple average over the first period changes, then alpha = 1 / period"""
+
+    name = "rsi"
+    fields = ("period", "previous", "count", "avg_gain", "avg_loss")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, close, high=None, low=None):
+        if self.previous is None:
+            self.previous = close
+            return NAN
+        change = close - self.previous
+        self.previous = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self.count += 1
+        if self.count <= self.period:
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+            if self.count < self.period:
+                return NAN
+        else:
+            self.avg_gain += (gain - self.avg_gain) / self.period
+            self.avg_loss += (loss - self.avg_loss) / self.period
+        if self.avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+
+class Bollinger(Indicator):
+    """Running sum and sum of squares, centered on the first value for precision"""
+
+    name = "bollinger"
+    fields = ("period", "k", "shift", "window", "total", "squares")
+
+    def __init__(self, period: int = 20, k: float = 2.0):
+        self.period = period
+        self.k = k
+        self.shift = None
+        self.window = deque()
+        self.total = 0.0
+        self.squares = 0.0
+
+    def update(self, close, high=None, low=None):
+        if self.shift is None:
+            self.shift = close
+        x = close - self.shift
+        self.window.append(x)
+        self.total += x
+        self.squares += x * x
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            self.total -= old
+            self.squares -= old * old
+        if len(self.window) < self.period:
+            return {"middle": NAN, "upper": NAN, "lower": NAN}
+        mean = self.total / self.period
+        variance = max(self.squares - self.total * mean, 0.0) / max(self.period - 1, 1)
+        std = math.sqrt(variance)
+        middle = mean + self.shift
+        return {"middle": middle, "upper": middle + self.k * std, "lower": middle - self.k * std}
+
+
+class RollingExtreme(Indicator):
+    """Rolling max (or min) over the last period values using a monotonic deque"""
+
+    name = "rolling_extreme"
+    fields = ("period", "maximum", "index", "candidates")
+
+    def __init__(self, period: int, maximum: bool = True):
+        self.period = period
+        self.maximum = maximum
+        self.index = 0
+        self.candidates = deque()  # (index, value), values monotonic from the front
+
+    def update(self, close, high=None, low=None):
+        value = close
+        if self.maximum:
+            while self.candidates and self.candidates[-1][1] <= value:
+                self.candidates.pop()
+        else:
+            while self.candidates and self.candidates[-1][1] >= value:
+                self.candidates.pop()
+        self.candidates.append((self.index, value))
+        if self.candidates[0][0] <= self.index - self.period:
+            self.candidates.popleft()
+        self.index += 1
+        return self.candidates[0][1] if self.index >= self.period else NAN
+
+
+class Stochastic(Indicator):
+    name = "stochastic"
+    fields = ("highest", "lowest")
+
+    def __init__(self, period: int = 14):
+        self.highest = RollingExtreme(period, maximum=True)
+        self.lowest = RollingExtreme(period, maximum=False)
+
+    def _extremes(self, close, high, low):
+        highest = self.highest.update(close if high is None else high)
+        lowest = self.lowest.update(close if low is None else low)
+        return highest, lowest
+
+    def update(self, close, high=None, low=None):
+        highest, lowest = self._extremes(close, high, low)
+        if math.isnan(highest) or highest == lowest:
+            return NAN
+        return 100.0 * (close - lowest) / (highest - lowest)
+
+
+class WilliamsR(Stochastic):
+    name = "williams_r"
+
+    def update(self, close, high=None, low=None):
+        highest, lowest = self._extremes(close, high, low)
+        if math.isnan(highest) or highest == lowest:
+            return NAN
+        return -100.0 * (highest - close) / (highest - lowest)
+
+
+INDICATOR_TYPES = {
+    cls.name: cls
+    for cls in (SMA, EMA, MACD, RSI, Bollinger, RollingExtreme, Stochastic, WilliamsR)
+}
+
+
+def indicator_from_state(state: Dict[str, Any]) -> Indicator:
+    return INDICATOR_TYPES[state["type"]].from_state(state)
+
+
+class IndicatorSet:
+    """A named group of indicators fed from the same bar stream
+
+    Live feeds repeat the still-forming bar several times before it closes; pass
+    ``closed=False`` for those updates and the set rewinds to the state before
+    the provisional bar on the next update, so each bar is counted once.
+    """
+
+    RECENT_VALUES = 256  # values kept per bar for consumers that catch up late
+
+    def __init__(self, indicators: Dict[str, Indicator], last_timestamp: Optional[int] = None):
+        self.indicators = indicators
+        self.last_timestamp = last_timestamp
+        self._checkpoint: Optional[Dict[str, Any]] = None
+        self.recent: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+
+    @classmethod
+    def from_params(cls, params: Dict[str, Dict[str, float]]) -> "IndicatorSet":
+        """Build from {indicator name: constructor params}, e.g. {"sma": {"period": 20}}"""
+        return cls({name: INDICATOR_TYPES[name](**p) for name, p in params.items()})
+
+    def update(self, close: float, high: Optional[float] = None, low: Optional[float] = None,
+               timestamp: Optional[int] = None, closed: bool = True) -> Dict[str, Any]:
+        if self._checkpoint is not None:
+            self.indicators = {n: indicator_from_state(s) for n, s in self._checkpoint["indicators"].items()}
+            self.last_timestamp = self._checkpoint["last_timestamp"]
+            self._checkpoint = None
+        if not closed:
+            self._checkpoint = self._state()
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        return {name: indicator.update(close, high, low) for name, indicator in self.indicators.items()}
+
+    def feed(self, bars: List[Tuple[int, float, float, float]], forming: bool = True) -> Dict[int, Dict[str, Any]]:
+        """Advance over (timestamp, close, high, low) bars in time order, the last one still
+        forming unless forming=False, and return the values at each of them
+
+        Bars already counted are skipped (their recent values are returned), so
+        several consumers of one series can feed the same bars to one set.
+        """
+        values = {}
+        for i, (timestamp, close, high, low) in enumerate(bars):
+            counted = self.last_timestamp is not None and (
+                timestamp < self.last_timestamp or (timestamp == self.last_timestamp and self._checkpoint is None)
+            )
+            if not counted:
+                provisional = forming and i == len(bars) - 1
+                self.recent[timestamp] = self.update(close, high, low, timestamp, closed=not provisional)
+                self.recent.move_to_end(timestamp)
+                while len(self.recent) > self.RECENT_VALUES:
+                    self.recent.popitem(last=False)
+            values[timestamp] = self.recent.get(timestamp)
+        return values
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "indicators": {n: i.to_state() for n, i in self.indicators.items()},
+            "last_timestamp": self.last_timestamp,
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        # A provisional bar is never persisted; it is replayed when the feed resumes
+        return self._checkpoint or self._state()
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "IndicatorSet":
+        return cls(
+            {n: indicator_from_state(s) for n, s in state["indicators"].items()},
+            state.get("last_timestamp"),
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_state(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "IndicatorSet":
+        with open(path) as f:
+            return cls.from_state(json.load(f))
+
+
+class LiveIndicators:
+    """Indicator sets fed by live series, one per series and indicator parameters
+
+    Every stream of a series shares its set (``IndicatorSet.feed`` counts each
+    bar once). ``save`` and ``load`` persist all sets as one JSON document, so
+    after a restart indicators resume from their last closed bar instead of
+    being recomputed from scratch. At most ``maxsets`` sets are kept (LRU).
+    """
+
+    def __init__(self, maxsets: int = 1024):
+        self.maxsets = maxsets
+        self.sets: "OrderedDict[str, IndicatorSet]" = OrderedDict()
+
+    @staticmethod
+    def key(series: Tuple[str, ...], params: Dict[str, Dict[str, float]]) -> str:
+        return json.dumps([list(series), params], sort_keys=True, separators=(",", ":"))
+
+    def get(self, series: Tuple[str, ...], params: Dict[str, Dict[str, float]]) -> IndicatorSet:
+        key = self.key(series, params)
+        live = self.sets.get(key)
+        if live is None:
+            live = self.sets[key] = IndicatorSet.from_params(params)
+        self.sets.move_to_end(key)
+        while len(self.sets) > self.maxsets:
+            self.sets.popitem(last=False)
+        return live
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({key: live.to_state() for key, live in self.sets.items()}, f)
+        os.replace(path + ".tmp", path)
+
+    def load(self, path: str) -> int:
+        """Restore saved sets; returns how many were loaded"""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            states = json.load(f)
+        for key, state in states.items():
+            self.sets[key] = IndicatorSet.from_state(state)
+        return len(states)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sets": len(self.sets), "maxsets": self.maxsets}
@@ -0,0 +1,139 @@
+"""Vectorized technical indicators over NumPy arrays
+
+Every function returns arrays aligned with its input; bars before an
+indicator's warm-up period is complete are NaN.
+"""
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _pad(values: np.ndarray, n: int) -> np.ndarray:
+    """Left-pad a shorter result with NaN so it lines up with the input"""
+    out = np.full(n, np.nan)
+    if len(values):
+        out[n - len(values):] = values
+    return out
+
+
+def _window_sums(values: np.ndarray, period: int) -> np.ndarray:
+    """Sums of every full window, from one prefix-sum pass"""
+    csum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return csum[period:] - csum[:-period]
+
+
+def sma(close: np.ndarray, period: int = 20) -> np.ndarray:
+    if len(close) < period:
+        return np.full(len(close), np.nan)
+    return _pad(_window_sums(close, period) / period, len(close))
+
+
+def ema(close: np.ndarray, period: int = 20) -> np.ndarray:
+    """EMA seeded with the first value (alpha = 2 / (period + 1))"""
+    return pd.Series(close, dtype=np.float64).ewm(span=period, adjust=False).mean().to_numpy()
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's RSI: gains and losses smoothed with alpha = 1 / period"""
+    n = len(close)
+    if n <= period:
+        return np.full(n, np.nan)
+    delta = np.diff(close)
+    gains = np.clip(delta, 0, None)
+    losses = np.clip(-delta, 0, None)
+    # Seed with the simple average of the first period changes, then smooth recursively
+    gains[period - 1] = gains[:period].mean()
+    losses[period - 1] = losses[:period].mean()
+    alpha = 1.0 / period
+    avg_gain = pd.Series(gains[period - 1:]).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    avg_loss = pd.Series(losses[period - 1:]).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return _pad(values, n)
+
+
+def bollinger(close: np.ndarray, period: int = 20, k: float = 2.0) -> Dict[str, np.ndarray]:
+    """Middle band is the SMA; bands are k sample standard deviations away"""
+    n = len(close)
+    if n < period:
+        empty = np.full(n, np.nan)
+        return {"middle": empty, "upper": empty.copy(), "lower": empty.copy()}
+    # Center before squaring so the prefix sums do not lose precision on large prices
+    centered = close - close[0]
+    sums = _window_sums(centered, period)
+    squares = _window_sums(centered * centered, period)
+    variance = np.maximum(squares - sums * sums / period, 0.0) / max(period - 1, 1)
+    middle = sums / period + close[0]
+    std = np.sqrt(variance)
+    return {
+        "middle": _pad(middle, n),
+        "upper": _pad(middle + k * std, n),
+        "lower": _pad(middle - k * std, n),
+    }
+
+
+def rolling_extremes(high: np.ndarray, low: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(high)
+    if n < period:
+        return np.full(n, np.nan), np.full(n, np.nan)
+    highest = sliding_window_view(high, period).max(axis=1)
+    lowest = sliding_window_view(low, period).min(axis=1)
+    return _pad(highest, n), _pad(lowest, n)
+
+
+def stochastic(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    highest, lowest = rolling_extremes(high, low, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (close - lowest) / (highest - lowest)
+
+
+def williams_r(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    highest, lowest = rolling_extremes(high, low, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -100.0 * (highest - close) / (highest - lowest)
+
+
+# name -> (default parameters, function of ({High, Low, Close} arrays, params))
+INDICATORS: Dict[str, Tuple[Dict[str, float], Callable]] = {
+    "sma": ({"period": 20}, lambda d, p: sma(d["Close"], int(p["period"]))),
+    "ema": ({"period": 20}, lambda d, p: ema(d["Close"], int(p["period"]))),
+    "macd": (
+        {"fast": 12, "slow": 26, "signal": 9},
+        lambda d, p: macd(d["Close"], int(p["fast"]), int(p["slow"]), int(p["signal"])),
+    ),
+    "rsi": ({"period": 14}, lambda d, p: rsi(d["Close"], int(p["period"]))),
+    "bollinger": (
+        {"period": 20, "k": 2.0},
+        lambda d, p: bollinger(d["Close"], int(p["period"]), float(p["k"])),
+    ),
+    "stochastic": (
+        {"period": 14},
+        lambda d, p: stochastic(d["High"], d["Low"], d["Close"], int(p["period"])),
+    ),
+    "williams_r": (
+        {"period": 14},
+        lambda d, p: williams_r(d["High"], d["Low"], d["Close"], int(p["period"])),
+    ),
+}
+
+
+def compute_indicator(data: pd.DataFrame, name: str, params: Dict[str, float]):
+    """Compute one named indicator over an OHLCV frame"""
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name}")
+    columns = {c: data[c].to_numpy(dtype=np.float64) for c in ("High", "Low", "Close")}
+    return INDICATORS[name][1](columns, params)
+
+
+def to_json_values(values: np.ndarray) -> list:
+    """List of floats with NaN/inf (warm-up bars, flat windows) replaced by None"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(values), values, None).tolist()
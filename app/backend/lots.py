@@ -0,0 +1,207 @@
+"""Lot matching for realized P&L over the trade log
+
+Trades carry no side or quantity, so each one is a single unit: an ``open``
+trade buys a lot at its price and a ``closed`` trade sells one, matched
+against the ticker's open lots first-in-first-out or last-in-first-out.
+``pending`` trades are ignored. Trades are processed in (time, id) order.
+
+Both books are kept up to date as trades change: a trade that arrives in
+order is applied in O(1); anything else (back-dated trades, updates,
+deletes) replays only the affected ticker. Realized totals are running sums,
+so queries never rescan the log. ``rebuild`` replays the whole log in one
+streaming pass, holding only the open lots in memory.
+
+With a ``versions`` source (per-ticker change counters kept by the database),
+writes made by other processes are picked up too: queries replay every
+ticker whose counter moved without this engine accounting for it.
+
+Writes never build the books: until the first build (``rebuild`` or the first
+query) they are skipped, since the build reads those trades from the source.
+"""
+import threading
+from collections import deque
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+METHODS = ("fifo", "lifo")
+
+
+class TickerLots:
+    __slots__ = ("lots", "realized", "matched", "unmatched", "last_key")
+
+    def __init__(self):
+        self.lots: deque = deque()  # (trade id, entry price)
+        self.realized = 0.0
+        self.matched = 0
+        self.unmatched = 0
+        self.last_key: Optional[Tuple[str, int]] = None
+
+
+class LotBook:
+    """Open lots and realized P&L per ticker under one matching method"""
+
+    def __init__(self, method: str = "fifo"):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        self.method = method
+        self.tickers: Dict[str, TickerLots] = {}
+        self.realized = 0.0
+
+    def in_order(self, trade: Dict[str, Any]) -> bool:
+        book = self.tickers.get(trade["ticker"])
+        return book is None or book.last_key is None or (trade["time"], trade["id"]) > book.last_key
+
+    def apply(self, trade: Dict[str, Any]) -> None:
+        """Apply the next trade of its ticker; trades must arrive in (time, id) order"""
+        book = self.tickers.get(trade["ticker"])
+        if book is None:
+            book = self.tickers[trade["ticker"]] = TickerLots()
+        book.last_key = (trade["time"], trade["id"])
+        if trade["status"] == "open":
+            book.lots.append((trade["id"], trade["price"]))
+        elif trade["status"] == "closed":
+            if not book.lots:
+                book.unmatched += 1
+                return
+            _, entry = book.lots.popleft() if self.method == "fifo" else book.lots.pop()
+            pnl = trade["price"] - entry
+            book.realized += pnl
+            book.matched += 1
+            self.realized += pnl
+
+    def reset(self, ticker: Optional[str] = None) -> None:
+        if ticker is None:
+            self.tickers.clear()
+            self.realized = 0.0
+        elif ticker in self.tickers:
+            self.realized -= self.tickers.pop(ticker).realized
+
+    def summary(self, ticker: Optional[str] = None) -> Dict[str, Any]:
+        tickers = [ticker] if ticker is not None else sorted(self.tickers)
+        by_ticker = {
+            t: {
+                "realized_pnl": self.tickers[t].realized,
+                "matched": self.tickers[t].matched,
+                "unmatched_closes": self.tickers[t].unmatched,
+                "open_lots": len(self.tickers[t].lots),
+            }
+            for t in tickers if t in self.tickers
+        }
+        realized = self.realized if ticker is None else by_ticker.get(ticker, {}).get("realized_pnl", 0.0)
+        return {"method": self.method, "realized_pnl": realized, "by_ticker": by_ticker}
+
+
+class LotEngine:
+    """FIFO and LIFO books kept in sync with a trade source
+
+    ``iter_trades(ticker=None)`` must yield trade dicts (id, ticker, price,
+    time, status) in (time, id) order, for one ticker or for all of them.
+    ``versions()``, if given, returns the change counter of every ticker.
+    """
+
+    def __init__(self, iter_trades, versions: Optional[Callable[[], Dict[str, int]]] = None):
+        self.iter_trades = iter_trades
+        self.versions = versions
+        self.books = {method: LotBook(method) for method in METHODS}
+        self._lock = threading.Lock()
+        self._built = False
+        self._synced: Dict[str, int] = {}  # counter of each ticker as last accounted for
+        # Tickers written while the books were not built yet, replayed by the next query in
+        # case the build had already read past them
+        self._dirty: Set[str] = set()
+        self._dirty_lock = threading.Lock()
+        self.replays = 0
+
+    def _replay(self, trades: Iterable[Dict[str, Any]], ticker: Optional[str] = None) -> None:
+        for book in self.books.values():
+            book.reset(ticker)
+        for trade in trades:
+            for book in self.books.values():
+                book.apply(trade)
+
+    def _current_versions(self) -> Dict[str, int]:
+        return self.versions() if self.versions is not None else {}
+
+    def _build(self) -> None:
+        # Writes that came before this build are read by it
+        with self._dirty_lock:
+            self._dirty.clear()
+        # Counters are read first: a write racing the replay leaves its ticker stale
+        versions = self._current_versions()
+        self._replay(self.iter_trades())
+        self._synced = versions
+        self._built = True
+
+    def rebuild(self) -> None:
+        """Replay the whole log in one streaming pass"""
+        with self._lock:
+            self._build()
+
+    def _skip_unbuilt(self, tickers: Iterable[str]) -> bool:
+        """True if the books are not built yet, after noting the tickers for the next query"""
+        if self._built:
+            return False
+        with self._dirty_lock:
+            self._dirty.update(tickers)
+        return True
+
+    def _sync(self) -> None:
+        """Replay tickers written to elsewhere (e.g. by another worker process) or
+        written here while the books were being built"""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for ticker in dirty:
+            self._replay_ticker(ticker)
+        for ticker, version in self._current_versions().items():
+            if self._synced.get(ticker) != version:
+                self._replay_ticker(ticker)
+                self._synced[ticker] = version
+
+    def record(self, *trades: Dict[str, Any]) -> None:
+        """Account for newly created trades"""
+        if self._skip_unbuilt(trade["ticker"] for trade in trades):
+            return
+        with self._lock:
+            stale = {}
+            for trade in trades:
+                if trade["ticker"] in stale:
+                    continue
+                if all(book.in_order(trade) for book in self.books.values()):
+                    for book in self.books.values():
+                        book.apply(trade)
+                else:
+                    stale[trade["ticker"]] = True
+            versions = self._current_versions()
+            # One replay per ticker; it reads every trade of the batch from the source
+            for ticker in stale:
+                self._replay_ticker(ticker)
+                if ticker in versions:
+                    self._synced[ticker] = versions[ticker]
+            # Applied trades are accounted for only if nobody else wrote to their ticker
+            for ticker, count in Counter(t["ticker"] for t in trades if t["ticker"] not in stale).items():
+                if ticker in versions and versions[ticker] == self._synced.get(ticker, 0) + count:
+                    self._synced[ticker] = versions[ticker]
+
+    def invalidate(self, *tickers: str) -> None:
+        """Replay tickers whose history changed (updated, back-dated or deleted trades)"""
+        if self._skip_unbuilt(tickers):
+            return
+        with self._lock:
+            versions = self._current_versions()
+            for ticker in dict.fromkeys(tickers):
+                self._replay_ticker(ticker)
+                if ticker in versions:
+                    self._synced[ticker] = versions[ticker]
+
+    def _replay_ticker(self, ticker: str) -> None:
+        self.replays += 1
+        self._replay(self.iter_trades(ticker), ticker)
+
+    def summary(self, method: str = "fifo", ticker: Optional[str] = None) -> Dict[str, Any]:
+        if method not in self.books:
+            raise ValueError(f"method must be one of {METHODS}")
+        with self._lock:
+            if not self._built:
+                self._build()
+            self._sync()
+            return self.books[method].summary(ticker)
@@ -1,17 +1,37 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationError, validator
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
+from email.utils import formatdate
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-import yfinance as yf
-from functools import lru_cache
 import asyncio
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import csv
+import hashlib
+import json
 import logging
-from collections import defaultdict
+import math
+import os
+import sqlite3
+import threading
+from cache import AsyncSingleFlight, TTLCache
+from columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, accepts_columnar, encode_columns
+from dataaccess import AsyncDataAccess, DataAccessOverloaded, DataAccessTimeout
+from lots import LotEngine
+from portfolio import value_open_trades
+from providers import get_provider, slice_period
+from regression import RegressionCache, bootstrap_bands, fit_line, rolling_channels
+from pubsub import PollerRegistry
+from store import get_store
+from resample import can_resample, resample_ohlcv
+from incremental import LiveIndicators
+from indicators import INDICATORS, compute_indicator, to_json_values
+from ratelimit import GCRARateLimiter, SharedGCRARateLimiter
+from symbols import SymbolRegistry
+from trades import FORMATS as TRADE_FORMATS, decode_trade, encode_trades, get_trade_store
 
 # Configure logging
 logging.basicConfig(
@@ -23,29 +43,79 @@ logger = logging.getLogger(__name__)
 # Rate limiting configuration
 RATE_LIMIT = 100  # requests per minute
 RATE_WINDOW = 60  # seconds
+RATE_LIMIT_MAX_CLIENTS = 100_000  # tracked client keys; idle ones are dropped first
+# SQLite file shared by all workers on the host; unset keeps limits per process
+RATE_LIMIT_DB = os.environ.get("TRENDTRADER_RATE_LIMIT_DB")
+# Requests to expensive routes use up more of the limit
+ROUTE_COSTS = {
+    "/stock-data/batch": 5,
+    "/symbols/validate": 5,
+    "/indicators": 2,
+    "/trades/import": 10,
+    "/trades/export": 10,
+}
 
-class RateLimiter:
-    def __init__(self):
-        self.requests = defaultdict(list)
-        
-    def is_allowed(self, client_id: str) -> bool:
-        now = datetime.now()
-        minute_ago = now - timedelta(seconds=RATE_WINDOW)
-        
-        # Clean old requests
-        self.requests[client_id] = [
-            req_time for req_time in self.requests[client_id]
-            if req_time > minute_ago
-        ]
-        
-        # Check rate limit
-        if len(self.requests[client_id]) >= RATE_LIMIT:
-            return False
-            
-        self.requests[client_id].append(now)
-        return True
+# Stock data cache configuration
+MAX_BATCH_TICKERS = 100  # tickers per /stock-data/batch request
+# (ticker, period, interval) entries; always room for a full batch next to the hot keys
+STOCK_CACHE_SIZE = max(int(os.environ.get("TRENDTRADER_STOCK_CACHE_SIZE", 512)), MAX_BATCH_TICKERS + 64)
+INDICATOR_CACHE_SIZE = 512  # (ticker, range, interval, indicator, params, series version) entries
+REGRESSION_CACHE_SIZE = 256  # (ticker, range, interval) running regression sums
+CHANNEL_CACHE_SIZE = 128  # (ticker, range, interval, window, k, series version) regression channels
+MAX_CHANNEL_WINDOW = 1000
+FORECAST_DAYS_AHEAD = 10
+BOOTSTRAP_RESAMPLES = 2000  # block-bootstrap resamples behind the forecast bands
+SHORT_INTERVALS = {'1m', '5m'}
+
+# Native intervals per range; the first one is the base series every other
+# interval of that range is resampled from
+VALID_RANGES = {
+    "1d": ["1m", "5m", "15m"],
+    "5d": ["5m", "15m", "1h"],
+    "1mo": ["15m", "1h", "1d"],
+    "6mo": ["1d", "1wk"],
+    "1y": ["1d", "1wk", "1mo"]
+}
 
-rate_limiter = RateLimiter()
+# Symbol registry configuration
+SYMBOL_FILE = os.environ.get("TRENDTRADER_SYMBOL_FILE")  # optional list of known-good tickers
+SYMBOL_VALID_TTL = 24 * 3600  # seconds
+SYMBOL_INVALID_TTL = 3600  # seconds
+
+# Blocking market data calls run in a bounded thread pool off the event loop
+MARKET_DATA_WORKERS = int(os.environ.get("TRENDTRADER_MARKET_DATA_WORKERS", 8))
+MARKET_DATA_MAX_PENDING = int(os.environ.get("TRENDTRADER_MARKET_DATA_MAX_PENDING", 64))
+MARKET_DATA_TIMEOUT = float(os.environ.get("TRENDTRADER_MARKET_DATA_TIMEOUT", 15))  # seconds
+
+# CPU-heavy analytics (bootstrap forecast bands) run in their own small pool
+COMPUTE_WORKERS = int(os.environ.get("TRENDTRADER_COMPUTE_WORKERS", 2))
+COMPUTE_MAX_PENDING = 64
+COMPUTE_TIMEOUT = 10  # seconds
+FORECAST_BAND_CACHE_SIZE = 256  # (ticker, range, interval, series version) bands
+FORECAST_BAND_TTL = 3600  # seconds; entries are keyed by series version, so this only bounds memory
+
+# Trade store; its blocking SQLite calls run in their own small pool
+TRADE_DB_POOL_SIZE = int(os.environ.get("TRENDTRADER_TRADE_DB_POOL", 4))
+TRADE_DB_MAX_PENDING = 256
+TRADE_DB_TIMEOUT = 10  # seconds
+TRADE_IMPORT_BATCH_SIZE = 500  # rows validated and inserted per transaction
+TRADE_EXPORT_BATCH_SIZE = 1000  # rows read per chunk of an export stream
+MAX_IMPORT_ERRORS = 1000  # row errors reported per import
+VALUATION_RANGE = "1d"  # open trades are marked at the last bar of this range's base series
+
+# Live streams check upstream for new or updated bars this often
+STREAM_POLL_SECONDS = float(os.environ.get("TRENDTRADER_STREAM_POLL_SECONDS", 15))
+STREAM_VIEW_CACHE_SIZE = 256  # (ticker, range, interval, published series) views shared by subscribers
+# Live indicator state of streamed series, saved on shutdown and restored on startup
+INDICATOR_STATE_FILE = os.environ.get(
+    "TRENDTRADER_INDICATOR_STATE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "indicator_state.json")
+)
+
+if RATE_LIMIT_DB:
+    rate_limiter = SharedGCRARateLimiter(RATE_LIMIT, RATE_WINDOW, RATE_LIMIT_DB)
+else:
+    rate_limiter = GCRARateLimiter(RATE_LIMIT, RATE_WINDOW, max_keys=RATE_LIMIT_MAX_CLIENTS)
 
 # Enhanced Pydantic models with validation
 class Trade(BaseModel):
@@ -80,6 +150,8 @@ class StockDataResponse(BaseModel):
     regression_data: Optional[List[float]] = None
     volume: Optional[List[int]] = None
     error_margin: Optional[float] = None
+    forecast_lower: Optional[List[float]] = None
+    forecast_upper: Optional[List[float]] = None
 
 app = FastAPI(
     title="Stock Trading API",
@@ -102,13 +174,21 @@ app.add_middleware(
 async def rate_limit_middleware(request: Request, call_next):
     client_id = request.client.host
     
-    if not rate_limiter.is_allowed(client_id):
+    try:
+        result = rate_limiter.check(client_id, ROUTE_COSTS.get(request.url.path, 1))
+    except sqlite3.Error as e:
+        # A locked or unavailable shared limiter must not take the API down with it
+        logger.error(f"Rate limiter unavailable: {str(e)}")
+        return await call_next(request)
+    if not result.allowed:
         return JSONResponse(
             status_code=429,
-            content={"detail": "Rate limit exceeded. Please try again later."}
+            content={"detail": "Rate limit exceeded. Please try again later."},
+            headers=result.headers(RATE_WINDOW)
         )
     
     response = await call_next(request)
+    response.headers.update(result.headers(RATE_WINDOW))
     return response
 
 # Error handling middleware
@@ -124,31 +204,96 @@ async def error_handling_middleware(request: Request, call_next):
             content={"detail": "An unexpected error occurred"}
         )
 
+# Market data source, selected with TRENDTRADER_PROVIDER (yfinance or local)
+provider = get_provider()
+
+# On-disk columnar bar store; refreshes only fetch bars newer than the last stored one
+ohlcv_store = get_store(provider)
+
+symbol_registry = SymbolRegistry(
+    lookup=provider.exists,
+    batch_lookup=provider.exists_many,
+    valid_ttl=SYMBOL_VALID_TTL,
+    invalid_ttl=SYMBOL_INVALID_TTL,
+)
+if SYMBOL_FILE:
+    logger.info(f"Preloaded {symbol_registry.preload(SYMBOL_FILE)} symbols from {SYMBOL_FILE}")
+
 def validate_ticker(ticker: str) -> str:
-    """Validate ticker symbol with yfinance"""
+    """Validate ticker symbol against the cached symbol registry"""
+    ticker = ticker.upper()
     try:
-        ticker = ticker.upper()
-        stock = yf.Ticker(ticker)
-        # Try to access basic info to verify ticker exists
-        info = stock.info
-        if not info:
-            raise ValueError(f"Invalid ticker: {ticker}")
-        return ticker
+        valid = symbol_registry.is_valid(ticker)
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid ticker symbol: {str(e)}"
         )
+    if not valid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+        )
+    return ticker
+
+stock_data_cache = TTLCache(maxsize=STOCK_CACHE_SIZE)
+
+def cache_ttl_for_interval(interval: str) -> int:
+    """Seconds a cached series stays fresh (15 minutes for short intervals, 1 hour otherwise)"""
+    return (15 if interval in SHORT_INTERVALS else 60) * 60
+
+# Concurrent misses for the same key share one upstream fetch; waiters await it on the
+# event loop, so they hold no worker thread or pool slot
+stock_data_flights = AsyncSingleFlight()
+
+resampled_cache = TTLCache(maxsize=STOCK_CACHE_SIZE)
 
-@lru_cache(maxsize=32)
-def get_stock_data_cached(ticker: str, period: str, interval: str) -> Tuple[pd.DataFrame, datetime]:
-    """Cached function to fetch stock data with timestamp"""
+def base_interval(period: str) -> str:
+    """Finest interval fetched for a range; coarser intervals are built from it"""
+    return VALID_RANGES[period][0]
+
+def resample_cached(ticker: str, period: str, interval: str, base_data: pd.DataFrame) -> pd.DataFrame:
+    """Resample the base series once per version of it (see stock_data_etag)"""
+    key = (ticker, period, interval, stock_data_etag(base_data))
+    data = resampled_cache.get(key)
+    if data is None:
+        data = resample_ohlcv(base_data, interval)
+        resampled_cache.set(key, data, cache_ttl_for_interval(base_interval(period)))
+    return data
+
+def _fetch_stock_data_batch(tickers: List[str], period: str, interval: str) -> Dict[str, pd.DataFrame]:
+    """Refresh several tickers with one multi-symbol download and cache each series"""
     try:
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period, interval=interval)
+        ohlcv_store.refresh_many(tickers, interval)
+    except Exception as e:
+        logger.error(f"Error fetching batch stock data: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch stock data: {str(e)}"
+        )
+
+    results = {}
+    for ticker in tickers:
+        data = ohlcv_store.read(ticker, interval, period)
         if data.empty:
-            raise ValueError(f"No data found for ticker {ticker}")
-        return data, datetime.now()
+            # Yahoo also answers throttling with no data; get_stock_data_many validates these
+            continue
+        symbol_registry.mark_valid(ticker)
+        stock_data_cache.set((ticker, period, interval), data, cache_ttl_for_interval(interval))
+        results[ticker] = data
+    return results
+
+def _fetch_stock_data(ticker: str, period: str, interval: str) -> pd.DataFrame:
+    """Fetch a series upstream and store it in the cache"""
+    key = (ticker, period, interval)
+    # A fetch that finished just before this one started may already have filled the entry
+    data = stock_data_cache.peek(key)
+    if data is not None:
+        return data
+
+    try:
+        ohlcv_store.refresh(ticker, interval)
+        data = ohlcv_store.read(ticker, interval, period)
     except Exception as e:
         logger.error(f"Error fetching stock data: {str(e)}")
         raise HTTPException(
@@ -156,27 +301,100 @@ def get_stock_data_cached(ticker: str, period: str, interval: str) -> Tuple[pd.D
             detail=f"Failed to fetch stock data: {str(e)}"
         )
 
-def calculate_regression(prices: List[float], days_ahead: int = 10) -> Tuple[List[float], float]:
-    """Calculate linear regression predictions with error margin"""
+    if data.empty:
+        # An empty answer may be throttling, so only the symbol lookup decides validity
+        if not symbol_registry.is_valid(ticker):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+            )
+        raise HTTPException(
+            status_code=404,
+            detail=f"No data found for ticker {ticker}"
+        )
+
+    stock_data_cache.set(key, data, cache_ttl_for_interval(interval))
+    return data
+
+def longest_range(base: str) -> str:
+    """Longest range whose base series is base (VALID_RANGES lists ranges shortest first)"""
+    return [period for period, intervals in VALID_RANGES.items() if intervals[0] == base][-1]
+
+def refresh_base_series(ticker: str, base: str) -> pd.DataFrame:
+    """Pull the newest bars upstream whether or not a cached series is still fresh;
+    returns the longest range built on the base interval, which covers every shorter one"""
+    ohlcv_store.refresh(ticker, base)
+    return ohlcv_store.read(ticker, base, longest_range(base))
+
+stream_view_cache = TTLCache(maxsize=STREAM_VIEW_CACHE_SIZE)
+
+def stream_series(base_data: pd.DataFrame, ticker: str, period: str, interval: str) -> pd.DataFrame:
+    """A (range, interval) view of a polled base series, built once per published
+    series and shared by every subscriber of that view"""
+    # The entry keeps base_data alive, so its id cannot be reused while the entry exists
+    key = (ticker, period, interval, id(base_data))
+    cached = stream_view_cache.get(key)
+    if cached is not None:
+        return cached[1]
+    base = base_interval(period)
+    data = slice_period(base_data, period)
+    # Polled bars are the freshest there are; /stock-data serves them too
+    stock_data_cache.set((ticker, period, base), data, cache_ttl_for_interval(base))
+    if interval != base:
+        data = resample_cached(ticker, period, interval, data)
+    stream_view_cache.set(key, (base_data, data), STREAM_POLL_SECONDS * 2)
+    return data
+
+market_data = AsyncDataAccess(
+    max_workers=MARKET_DATA_WORKERS,
+    max_pending=MARKET_DATA_MAX_PENDING,
+    timeout=MARKET_DATA_TIMEOUT,
+)
+
+async def run_market_data_call(fn, *args):
+    """Await a blocking market data call in the worker pool, mapping pool errors to HTTP errors"""
     try:
-        if len(prices) < 2:
-            raise ValueError("Insufficient data points for regression")
-            
-        X = np.arange(len(prices)).reshape(-1, 1)
-        y = np.array(prices)
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Calculate prediction error margin (RMSE)
-        y_pred = model.predict(X)
-        rmse = np.sqrt(np.mean((y - y_pred) ** 2))
-        
-        # Make future predictions
-        future_X = np.arange(len(prices), len(prices) + days_ahead).reshape(-1, 1)
-        predictions = model.predict(future_X)
-        
-        return predictions.tolist(), rmse
+        return await market_data.run(fn, *args)
+    except DataAccessTimeout as e:
+        logger.error(f"Market data call timed out: {str(e)}")
+        raise HTTPException(
+            status_code=504,
+            detail="Upstream market data request timed out"
+        )
+    except DataAccessOverloaded as e:
+        logger.error(f"Market data pool overloaded: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many pending market data requests. Please try again later."
+        )
+
+async def get_stock_data_async(ticker: str, period: str, interval: str) -> pd.DataFrame:
+    """Cache hits are served on the event loop; misses are fetched in the worker pool"""
+    base = base_interval(period)
+    if interval != base:
+        return resample_cached(ticker, period, interval, await get_stock_data_async(ticker, period, base))
+
+    key = (ticker, period, interval)
+    data = stock_data_cache.get(key)
+    if data is not None:
+        return data
+    # Only the leader goes to the pool
+    return await stock_data_flights.do(key, lambda: run_market_data_call(_fetch_stock_data, ticker, period, interval))
+
+# Trend-line fits per (ticker, range, interval), extended as bars are appended
+regression_cache = RegressionCache(maxsize=REGRESSION_CACHE_SIZE)
+
+def calculate_regression(prices, days_ahead: int = FORECAST_DAYS_AHEAD, series_key: Optional[Tuple] = None,
+                         timestamps: Optional[np.ndarray] = None) -> Tuple[List[float], float]:
+    """Closed-form linear regression forecast with its RMSE as the error margin; with a
+    series_key (and the bar timestamps) the fit is reused and extended across requests"""
+    try:
+        prices = np.asarray(prices, dtype=np.float64)
+        if series_key is not None and timestamps is not None:
+            fit = regression_cache.fit(series_key, timestamps, prices)
+        else:
+            fit = fit_line(prices)
+        return fit.forecast(days_ahead).tolist(), fit.rmse
         
     except Exception as e:
         logger.error(f"Regression calculation error: {str(e)}")
@@ -185,57 +403,185 @@ def calculate_regression(prices: List[float], days_ahead: int = 10) -> Tuple[Lis
             detail=f"Regression calculation failed: {str(e)}"
         )
 
+def calculate_forecast_bands(prices, days_ahead: int = FORECAST_DAYS_AHEAD) -> Tuple[List[float], List[float]]:
+    """95% band around the regression forecast from block-bootstrapped residuals"""
+    try:
+        lower, upper = bootstrap_bands(prices, days_ahead, resamples=BOOTSTRAP_RESAMPLES)
+        return lower.tolist(), upper.tolist()
+
+    except Exception as e:
+        logger.error(f"Forecast band calculation error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Forecast band calculation failed: {str(e)}"
+        )
+
+compute_pool = AsyncDataAccess(
+    max_workers=COMPUTE_WORKERS,
+    max_pending=COMPUTE_MAX_PENDING,
+    timeout=COMPUTE_TIMEOUT,
+)
+
+# Bands per (ticker, range, interval) and series version, as for the regression fits
+forecast_band_cache = TTLCache(maxsize=FORECAST_BAND_CACHE_SIZE)
+
+async def get_forecast_bands(series_key: Tuple[str, str, str],
+                             historical_data: pd.DataFrame) -> Tuple[List[float], List[float]]:
+    """Forecast bands for a series version: cache hits on the event loop, misses in the compute pool"""
+    key = (*series_key, stock_data_etag(historical_data))
+    bands = forecast_band_cache.get(key)
+    if bands is not None:
+        return bands
+    prices = historical_data["Close"].to_numpy(dtype=np.float64)
+    try:
+        bands = await compute_pool.run(calculate_forecast_bands, prices)
+    except DataAccessTimeout as e:
+        logger.error(f"Forecast band calculation timed out: {str(e)}")
+        raise HTTPException(
+            status_code=504,
+            detail="Forecast band calculation timed out"
+        )
+    except DataAccessOverloaded as e:
+        logger.error(f"Compute pool overloaded: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many pending calculations. Please try again later."
+        )
+    forecast_band_cache.set(key, bands, FORECAST_BAND_TTL)
+    return bands
+
 def validate_time_params(range: str, interval: str) -> tuple[str, str]:
     """Validate and adjust time parameters with enhanced rules"""
-    valid_ranges = {
-        "1d": ["1m", "5m", "15m"],
-        "5d": ["5m", "15m", "1h"],
-        "1mo": ["15m", "1h", "1d"],
-        "6mo": ["1d", "1wk"],
-        "1y": ["1d", "1wk", "1mo"]
-    }
-    
-    if range not in valid_ranges:
+    if range not in VALID_RANGES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid range. Must be one of {list(valid_ranges.keys())}"
+            detail=f"Invalid range. Must be one of {list(VALID_RANGES.keys())}"
         )
         
-    if interval not in valid_ranges[range]:
+    # Intervals yfinance cannot serve directly (e.g. 2m, 30m, 4h) are resampled from the base series
+    if interval not in VALID_RANGES[range] and not can_resample(base_interval(range), interval):
         # Auto-adjust to most appropriate interval
-        interval = valid_ranges[range][0]
+        interval = VALID_RANGES[range][0]
         logger.info(f"Adjusted interval to {interval} for range {range}")
         
     return range, interval
 
+def first_bar_since(historical_data: pd.DataFrame, since: Optional[int]) -> int:
+    """Position of the first bar at or after since (epoch seconds); 0 when since is None"""
+    if since is None:
+        return 0
+    return int(np.searchsorted(historical_data.index.asi8 // 10**9, since, side="left"))
+
+def stock_data_fields(historical_data: pd.DataFrame, show_regression: bool, since: Optional[int] = None,
+                      series_key: Optional[Tuple] = None,
+                      forecast_bands: Optional[Tuple[List[float], List[float]]] = None) -> Dict:
+    """The /stock-data fields as plain lists, converted from the frame's arrays in C;
+    forecast_bands are the (lower, upper) bands from get_forecast_bands, if requested"""
+    prices = historical_data["Close"].to_numpy(dtype=np.float64)
+
+    regression_data = None
+    error_margin = None
+    forecast_lower = forecast_upper = None
+    if show_regression and len(prices) >= 2:
+        regression_data, error_margin = calculate_regression(
+            prices, series_key=series_key, timestamps=historical_data.index.asi8
+        )
+        error_margin = float(error_margin)
+        if forecast_bands is not None:
+            forecast_lower, forecast_upper = forecast_bands
+
+    # The regression always covers the whole series; only the bars are cut by since
+    start = first_bar_since(historical_data, since)
+    # Same key order as StockDataResponse so both paths encode identically
+    return {
+        "timestamps": (historical_data.index.asi8[start:] // 10**9).tolist(),
+        "prices": prices[start:].tolist(),
+        "regression_data": regression_data,
+        "volume": historical_data["Volume"].to_numpy(dtype=np.int64)[start:].tolist(),
+        "error_margin": error_margin,
+        "forecast_lower": forecast_lower,
+        "forecast_upper": forecast_upper,
+    }
+
+def build_stock_data_response(historical_data: pd.DataFrame, show_regression: bool) -> StockDataResponse:
+    """Shape a cached series into a validated StockDataResponse"""
+    return StockDataResponse(**stock_data_fields(historical_data, show_regression))
+
+def render_json(content, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Encode already-typed content exactly as JSONResponse would, skipping response_model validation"""
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+    return Response(content=body.encode("utf-8"), media_type="application/json", headers=headers)
+
+def build_stock_data_columnar(historical_data: pd.DataFrame, show_regression: bool, since: Optional[int] = None,
+                              series_key: Optional[Tuple] = None,
+                              forecast_bands: Optional[Tuple[List[float], List[float]]] = None) -> bytes:
+    """Encode the /stock-data fields as binary columns straight from the frame's arrays"""
+    prices = historical_data["Close"].to_numpy()
+    start = first_bar_since(historical_data, since)
+    columns = {
+        "timestamps": historical_data.index.asi8[start:] // 10**9,
+        "prices": prices[start:],
+    }
+    error_margin = None
+    if show_regression and len(prices) >= 2:
+        columns["regression_data"], error_margin = calculate_regression(
+            prices, series_key=series_key, timestamps=historical_data.index.asi8
+        )
+    columns["volume"] = historical_data["Volume"].to_numpy()[start:]
+    if error_margin is not None:
+        columns["error_margin"] = np.array([error_margin])
+        if forecast_bands is not None:
+            columns["forecast_lower"], columns["forecast_upper"] = (np.array(band) for band in forecast_bands)
+    return encode_columns(columns)
+
+def stock_data_etag(historical_data: pd.DataFrame, *variant) -> str:
+    """Validator for a rendered series: the last bar (which changes while it is still
+    forming), the series length and whatever else shapes the body"""
+    last = historical_data.iloc[-1]
+    key = (historical_data.index.asi8[-1], len(historical_data), float(last["Close"]), int(last["Volume"]), *variant)
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
 @app.get("/stock-data", response_model=StockDataResponse)
 async def get_stock_data(
+    request: Request,
     ticker: str,
     interval: str = "1m",
     range: str = "1d",
-    show_regression: bool = False
+    show_regression: bool = False,
+    forecast_bands: bool = False,
+    since: Optional[int] = None
 ):
     """
-    Enhanced endpoint to fetch stock data with improved error handling and validation
+    Enhanced endpoint to fetch stock data with improved error handling and validation.
+    With show_regression and forecast_bands, forecast_lower/forecast_upper give a 95%
+    band for each forecast point from a block bootstrap of the regression residuals.
+    Send "Accept: application/vnd.trendtrader.columnar" for the binary columnar format.
+    With since=<epoch seconds> only bars at or after that time are returned (pass the
+    last bar you have; it is resent because it may have changed). Responses carry an
+    ETag and Last-Modified; a matching If-None-Match gets 304 Not Modified.
     """
     try:
-        # Validate ticker
-        ticker = validate_ticker(ticker)
+        # Reject known-bad tickers; unknown ones are validated by the fetch itself
+        ticker = ticker.upper()
+        if symbol_registry.known(ticker) is False:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+            )
         
         # Validate time parameters
         range, interval = validate_time_params(range, interval)
         
-        # Get cached data
-        historical_data, cache_time = get_stock_data_cached(ticker, range, interval)
-        
-        # Check if cache is too old (15 minutes for short intervals, 1 hour for daily)
-        cache_age = datetime.now() - cache_time
-        max_cache_age = timedelta(minutes=15 if interval in ['1m', '5m'] else 60)
-        
-        if cache_age > max_cache_age:
-            # Clear specific cache entry
-            get_stock_data_cached.cache_clear()
-            historical_data, _ = get_stock_data_cached(ticker, range, interval)
+        # Get cached data (stale entries are refetched individually)
+        historical_data = await get_stock_data_async(ticker, range, interval)
+        symbol_registry.mark_valid(ticker)
         
         if historical_data.empty:
             raise HTTPException(
@@ -243,21 +589,33 @@ async def get_stock_data(
                 detail="No data found for the specified parameters"
             )
             
-        timestamps = [int(ts.timestamp()) for ts in historical_data.index]
-        prices = historical_data["Close"].tolist()
-        volume = historical_data["Volume"].tolist()
-        
-        regression_data = None
-        error_margin = None
-        if show_regression and len(prices) >= 2:
-            regression_data, error_margin = calculate_regression(prices)
-            
-        return StockDataResponse(
-            timestamps=timestamps,
-            prices=prices,
-            regression_data=regression_data,
-            volume=volume,
-            error_margin=error_margin
+        columnar = accepts_columnar(request.headers.get("accept"))
+        etag = stock_data_etag(historical_data, ticker, range, interval, show_regression, forecast_bands,
+                               since, columnar)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(historical_data.index[-1].timestamp(), usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept",
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        bands = None
+        if show_regression and forecast_bands and len(historical_data) >= 2:
+            bands = await get_forecast_bands((ticker, range, interval), historical_data)
+
+        if columnar:
+            return Response(
+                content=build_stock_data_columnar(
+                    historical_data, show_regression, since, (ticker, range, interval), bands
+                ),
+                media_type=COLUMNAR_MEDIA_TYPE,
+                headers=headers
+            )
+        return render_json(
+            stock_data_fields(historical_data, show_regression, since, (ticker, range, interval), bands),
+            headers
         )
         
     except HTTPException:
@@ -269,17 +627,435 @@ async def get_stock_data(
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+async def poll_stream_series(key: Tuple[str, str], previous: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Refresh a streamed (ticker, base interval) series upstream; None when its last bar has not changed"""
+    data = await run_market_data_call(refresh_base_series, *key)
+    if data.empty or (previous is not None and stock_data_etag(previous) == stock_data_etag(data)):
+        return None
+    return data
+
+def log_stream_error(key: Tuple[str, str], error: Exception) -> None:
+    logger.error(f"Error polling stream {key}: {getattr(error, 'detail', str(error))}")
+
+def stream_key(ticker: str, period: str) -> Tuple[str, str]:
+    """Poller key of a stream: streams of every range and interval built on the
+    same base series share one upstream poller"""
+    return ticker, base_interval(period)
+
+stream_pollers = PollerRegistry(poll_stream_series, interval=STREAM_POLL_SECONDS, on_error=log_stream_error)
+
+live_indicators = LiveIndicators()
+try:
+    logger.info(f"Restored {live_indicators.load(INDICATOR_STATE_FILE)} live indicator sets")
+except (OSError, ValueError, KeyError) as e:
+    logger.error(f"Could not restore live indicators from {INDICATOR_STATE_FILE}: {str(e)}")
+
+def indicator_bars(historical_data: pd.DataFrame, since: Optional[int] = None) -> List[Tuple[int, float, float, float]]:
+    """(timestamp, close, high, low) of the bars at or after since, to feed live indicators"""
+    part = historical_data.iloc[first_bar_since(historical_data, since):]
+    return list(zip(
+        (part.index.asi8 // 10**9).tolist(), part["Close"].tolist(), part["High"].tolist(), part["Low"].tolist()
+    ))
+
+def json_indicator_values(values: Optional[Dict]) -> Optional[Dict]:
+    """Indicator values with NaN (warm-up bars) replaced by None"""
+    if values is None:
+        return None
+    finite = lambda v: v if math.isfinite(v) else None
+    return {
+        name: {line: finite(v) for line, v in value.items()} if isinstance(value, dict) else finite(value)
+        for name, value in values.items()
+    }
+
+def sse_message(event: str, data) -> str:
+    """One Server-Sent Events message with a compact JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def changed_bars(historical_data: pd.DataFrame, last_bar: Optional[Dict]) -> List[Dict]:
+    """Bars that are new since last_bar, plus last_bar itself if it changed while forming"""
+    start = first_bar_since(historical_data, last_bar["timestamp"]) if last_bar else 0
+    fields = stock_data_fields(historical_data.iloc[start:], show_regression=False)
+    bars = [
+        {"timestamp": ts, "price": price, "volume": volume}
+        for ts, price, volume in zip(fields["timestamps"], fields["prices"], fields["volume"])
+    ]
+    if bars and bars[0] == last_bar:
+        bars = bars[1:]
+    return bars
+
+@app.get("/stock-data/stream")
+async def stream_stock_data(
+    request: Request,
+    ticker: str,
+    interval: str = "1m",
+    range: str = "1d",
+    indicators: Optional[str] = None
+):
+    """
+    Server-Sent Events stream of a series: one "snapshot" event in the /stock-data
+    shape, then a "bar" event ({timestamp, price, volume}) for every new bar and
+    every update to the bar still forming. With indicators (as for /indicators),
+    the snapshot and every bar also carry the indicator values at that bar, updated
+    incrementally per bar.
+    """
+    requested = requested_indicators(indicators, request.query_params) if indicators else None
+    ticker = ticker.upper()
+    if symbol_registry.known(ticker) is False:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+        )
+    range, interval = validate_time_params(range, interval)
+    snapshot = await get_stock_data_async(ticker, range, interval)
+    if snapshot.empty:
+        raise HTTPException(
+            status_code=404,
+            detail="No data found for the specified parameters"
+        )
+    symbol_registry.mark_valid(ticker)
+
+    # Subscribers share the poller's base series and each (range, interval) view of it
+    subscription = stream_pollers.subscribe(stream_key(ticker, range))
+    # Shared by every stream of this series and these indicators; catches up from saved state
+    live = live_indicators.get((ticker, range, interval), requested) if requested else None
+
+    async def events():
+        with subscription:
+            fields = stock_data_fields(snapshot, show_regression=False)
+            if live is not None:
+                values = live.feed(indicator_bars(snapshot))
+                fields["indicators"] = json_indicator_values(values.get(fields["timestamps"][-1]))
+            yield sse_message("snapshot", fields)
+            last_bar = changed_bars(snapshot.iloc[-1:], None)[0]
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(subscription.get(), STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                data = stream_series(data, ticker, range, interval)
+                bars = changed_bars(data, last_bar)
+                if live is not None and bars:
+                    values = live.feed(indicator_bars(data, bars[0]["timestamp"]))
+                for bar in bars:
+                    last_bar = bar
+                    if live is not None:
+                        bar = {**bar, "indicators": json_indicator_values(values.get(bar["timestamp"]))}
+                    yield sse_message("bar", bar)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the subscription even if the stream was never iterated
+        background=BackgroundTask(subscription.close)
+    )
+
+async def get_stock_data_many(symbols: List[str], period: str) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """Base series for many tickers: cache hits first, then one multi-symbol
+    download per MAX_BATCH_TICKERS misses. Returns (series, errors) by ticker."""
+    base = base_interval(period)
+    errors = {}
+    series = {}
+    misses = []
+    for ticker in symbols:
+        if symbol_registry.known(ticker) is False:
+            errors[ticker] = f"Invalid ticker symbol: Invalid ticker: {ticker}"
+            continue
+        data = stock_data_cache.get((ticker, period, base))
+        if data is None:
+            misses.append(ticker)
+        else:
+            series[ticker] = data
+
+    for i in range(0, len(misses), MAX_BATCH_TICKERS):
+        chunk = misses[i:i + MAX_BATCH_TICKERS]
+        series.update(await run_market_data_call(_fetch_stock_data_batch, chunk, period, base))
+        empty = [ticker for ticker in chunk if ticker not in series]
+        if empty:
+            verdicts = await run_market_data_call(symbol_registry.validate_many, empty)
+            for ticker in empty:
+                if verdicts.get(ticker, False):
+                    errors[ticker] = f"No data found for ticker {ticker}"
+                else:
+                    errors[ticker] = f"Invalid ticker symbol: Invalid ticker: {ticker}"
+    return series, errors
+
+@app.get("/stock-data/batch")
+async def get_stock_data_batch(
+    tickers: str,
+    interval: str = "1m",
+    range: str = "1d",
+    show_regression: bool = False
+):
+    """
+    Fetch series for a comma-separated list of tickers in one request; all cache
+    misses are served by a single multi-symbol download
+    """
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    if len(symbols) > MAX_BATCH_TICKERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_TICKERS} tickers per request"
+        )
+
+    try:
+        range, interval = validate_time_params(range, interval)
+        base = base_interval(range)
+        series, errors = await get_stock_data_many(symbols, range)
+
+        results = {}
+        for ticker in symbols:
+            if ticker not in series:
+                continue
+            data = series[ticker]
+            if interval != base:
+                data = resample_cached(ticker, range, interval, data)
+            results[ticker] = stock_data_fields(data, show_regression, series_key=(ticker, range, interval))
+
+        return render_json({"data": results, "errors": errors})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_stock_data_batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {str(e)}"
+        )
+
+indicator_cache = TTLCache(maxsize=INDICATOR_CACHE_SIZE)
+
+def indicator_params(name: str, query) -> Dict[str, float]:
+    """Read <indicator>_<param> query parameters, falling back to the defaults"""
+    defaults, _ = INDICATORS[name]
+    params = {}
+    for param, default in defaults.items():
+        raw = query.get(f"{name}_{param}")
+        try:
+            value = type(default)(raw) if raw is not None else default
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for {name}_{param}: {raw}")
+        if value <= 0:
+            raise HTTPException(status_code=400, detail=f"{name}_{param} must be positive")
+        params[param] = value
+    return params
+
+def requested_indicators(indicators: str, query) -> Dict[str, Dict[str, float]]:
+    """Indicators named in a comma-separated list, with their parameters"""
+    names = list(dict.fromkeys(n.strip().lower() for n in indicators.split(",") if n.strip()))
+    unknown = [n for n in names if n not in INDICATORS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown indicators {unknown}. Must be from {list(INDICATORS)}"
+        )
+    return {name: indicator_params(name, query) for name in names}
+
+@app.get("/indicators")
+async def get_indicators(
+    request: Request,
+    ticker: str,
+    interval: str = "1m",
+    range: str = "1d",
+    indicators: str = "sma,ema,macd,rsi"
+):
+    """
+    Compute technical indicators over the cached series. Available indicators:
+    sma, ema, macd, rsi, bollinger, stochastic, williams_r. Periods are set with
+    <indicator>_<param> query parameters, e.g. sma_period=50 or macd_fast=8.
+    """
+    requested = requested_indicators(indicators, request.query_params)
+
+    try:
+        ticker = ticker.upper()
+        if symbol_registry.known(ticker) is False:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+            )
+        range, interval = validate_time_params(range, interval)
+        historical_data = await get_stock_data_async(ticker, range, interval)
+        if historical_data.empty:
+            raise HTTPException(
+                status_code=404,
+                detail="No data found for the specified parameters"
+            )
+
+        # The last bar changes while it is still forming, so key on the whole series version
+        version = stock_data_etag(historical_data)
+        ttl = cache_ttl_for_interval(base_interval(range))
+        results = {}
+        for name, params in requested.items():
+            key = (ticker, range, interval, name, tuple(sorted(params.items())), version)
+            values = indicator_cache.get(key)
+            if values is None:
+                computed = compute_indicator(historical_data, name, params)
+                if isinstance(computed, dict):
+                    values = {line: to_json_values(v) for line, v in computed.items()}
+                else:
+                    values = to_json_values(computed)
+                indicator_cache.set(key, values, ttl)
+            results[name] = {"params": params, "values": values}
+
+        return {
+            "timestamps": [int(ts.timestamp()) for ts in historical_data.index],
+            "indicators": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_indicators: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {str(e)}"
+        )
+
+channel_cache = TTLCache(maxsize=CHANNEL_CACHE_SIZE)
+
+@app.get("/regression-channels")
+async def get_regression_channels(
+    ticker: str,
+    interval: str = "1m",
+    range: str = "1d",
+    window: int = 20,
+    k: float = 2.0
+):
+    """
+    Rolling regression channel over the cached series: for every bar, the slope
+    and fitted value of the least-squares line over the last `window` bars and
+    bands `k` residual standard deviations around it. Bars before the first
+    full window are null.
+    """
+    if not 2 <= window <= MAX_CHANNEL_WINDOW:
+        raise HTTPException(status_code=400, detail=f"window must be between 2 and {MAX_CHANNEL_WINDOW}")
+    if k <= 0:
+        raise HTTPException(status_code=400, detail="k must be positive")
+
+    try:
+        ticker = ticker.upper()
+        if symbol_registry.known(ticker) is False:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid ticker symbol: Invalid ticker: {ticker}"
+            )
+        range, interval = validate_time_params(range, interval)
+        historical_data = await get_stock_data_async(ticker, range, interval)
+        if historical_data.empty:
+            raise HTTPException(
+                status_code=404,
+                detail="No data found for the specified parameters"
+            )
+
+        # The last bar changes while it is still forming, so key on the whole series version
+        key = (ticker, range, interval, window, k, stock_data_etag(historical_data))
+        channels = channel_cache.get(key)
+        if channels is None:
+            computed = rolling_channels(historical_data['Close'].to_numpy(), window, k)
+            channels = {line: to_json_values(values) for line, values in computed.items()}
+            channel_cache.set(key, channels, cache_ttl_for_interval(base_interval(range)))
+
+        return {
+            "timestamps": [int(ts.timestamp()) for ts in historical_data.index],
+            "window": window,
+            "k": k,
+            **channels
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_regression_channels: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {str(e)}"
+        )
+
+@app.get("/symbols/validate")
+async def validate_symbols(tickers: str):
+    """Validate a comma-separated list of tickers in one batch"""
+    symbols = [t for t in tickers.split(",") if t.strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    try:
+        return {"symbols": await run_market_data_call(symbol_registry.validate_many, symbols)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error validating symbols: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to validate symbols: {str(e)}"
+        )
+
 # Trade management endpoints with improved error handling
+trade_store = get_trade_store(pool_size=TRADE_DB_POOL_SIZE)
+
+trade_db = AsyncDataAccess(
+    max_workers=TRADE_DB_POOL_SIZE,
+    max_pending=TRADE_DB_MAX_PENDING,
+    timeout=TRADE_DB_TIMEOUT,
+)
+
+# Realized P&L books (FIFO and LIFO), kept in step with every trade store write
+# Books follow writes from every worker through the store's per-ticker change counters
+lot_engine = LotEngine(lambda ticker=None: trade_store.iter_trades(ticker), lambda: trade_store.versions())
+
+def create_trade_record(trade: Dict) -> Dict:
+    created = trade_store.create(trade)
+    lot_engine.record(created)
+    return created
+
+def create_trade_records(trades: List[Dict]) -> List[Dict]:
+    created = trade_store.create_many(trades)
+    lot_engine.record(*created)
+    return created
+
+def update_trade_record(trade_id: int, trade: Dict) -> Optional[Dict]:
+    previous = trade_store.get(trade_id)
+    updated = trade_store.update(trade_id, trade)
+    if updated is not None:
+        lot_engine.invalidate(previous["ticker"], updated["ticker"])
+    return updated
+
+def delete_trade_record(trade_id: int) -> Optional[Dict]:
+    deleted = trade_store.delete(trade_id)
+    if deleted is not None:
+        lot_engine.invalidate(deleted["ticker"])
+    return deleted
+
+async def run_trade_store_call(fn, *args):
+    """Await a blocking trade store call off the event loop, mapping pool errors to HTTP errors"""
+    try:
+        return await trade_db.run(fn, *args)
+    except DataAccessTimeout as e:
+        logger.error(f"Trade store call timed out: {str(e)}")
+        raise HTTPException(
+            status_code=504,
+            detail="Trade store request timed out"
+        )
+    except DataAccessOverloaded as e:
+        logger.error(f"Trade store pool overloaded: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many pending trade store requests. Please try again later."
+        )
+
 @app.post("/trades")
 async def create_trade(trade: Trade):
     """Create a new trade entry with validation"""
     try:
         # Validate ticker before creating trade
-        validate_ticker(trade.ticker)
+        await run_market_data_call(validate_ticker, trade.ticker)
         
-        trade_dict = trade.dict()
-        trade_log.append(trade_dict)
-        return {"id": len(trade_log) - 1, "trade": trade_dict}
+        created = await run_trade_store_call(create_trade_record, trade.dict())
+        return {"id": created["id"], "trade": created}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating trade: {str(e)}")
         raise HTTPException(
@@ -288,42 +1064,273 @@ async def create_trade(trade: Trade):
         )
 
 @app.get("/trades")
-async def list_trades():
-    """List all trades with pagination"""
-    return {"trades": trade_log}
+async def list_trades(
+    ticker: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sort: str = "id",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    List trades with cursor pagination. Filter by ticker, status and a time range
+    (start/end, inclusive), sort by id or time ("-time" for newest first), pick
+    columns with fields=ticker,price and pass next_cursor back to get the next page.
+    """
+    try:
+        return await run_trade_store_call(
+            trade_store.page,
+            ticker.upper() if ticker else None,
+            status,
+            start.isoformat() if start else None,
+            end.isoformat() if end else None,
+            sort,
+            limit,
+            cursor,
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def request_lines(request: Request):
+    """Decoded lines of a streamed request body with their 1-based line numbers"""
+    buffer = b""
+    number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield number + 1, buffer.decode("utf-8").rstrip("\r")
+
+async def import_trade_batch(batch: List[Tuple[int, Dict]], report: Dict) -> None:
+    """Validate a batch of parsed rows (one symbol lookup for all tickers) and insert the valid ones"""
+    def fail(line: int, error: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_IMPORT_ERRORS:
+            report["errors"].append({"line": line, "error": error})
+
+    trades = []
+    for line, record in batch:
+        try:
+            trades.append((line, Trade(**record).dict()))
+        except ValidationError as e:
+            fail(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    if not trades:
+        return
+
+    verdicts = await run_market_data_call(symbol_registry.validate_many, [t["ticker"] for _, t in trades])
+    valid = []
+    for line, trade in trades:
+        if verdicts.get(symbol_registry.normalize(trade["ticker"])):
+            valid.append(trade)
+        else:
+            fail(line, f"Invalid ticker symbol: {trade['ticker']}")
+    if valid:
+        await run_trade_store_call(create_trade_records, valid)
+        report["imported"] += len(valid)
+
+@app.post("/trades/import")
+async def import_trades(request: Request, format: Optional[str] = None):
+    """
+    Bulk-import trades from an NDJSON or CSV (with header row) request body. The body
+    is read as a stream and inserted in batched transactions; rows that fail
+    validation are reported by line number and the rest are still imported.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("csv" if "csv" in content_type else "ndjson")
+    if fmt not in TRADE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(TRADE_FORMATS)}")
+
+    report = {"imported": 0, "failed": 0, "errors": []}
+    header = None
+    batch = []
+    try:
+        async for line, text in request_lines(request):
+            if not text.strip():
+                continue
+            if fmt == "csv" and header is None:
+                header = [name.strip().lower() for name in next(csv.reader([text]))]
+                continue
+            try:
+                batch.append((line, decode_trade(text, fmt, header)))
+            except ValueError as e:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_IMPORT_ERRORS:
+                    report["errors"].append({"line": line, "error": str(e)})
+            if len(batch) >= TRADE_IMPORT_BATCH_SIZE:
+                await import_trade_batch(batch, report)
+                batch = []
+        if batch:
+            await import_trade_batch(batch, report)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing trades: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Import failed after {report['imported']} trades: {str(e)}"
+        )
+    report["errors"].sort(key=lambda error: error["line"])
+    return report
+
+@app.get("/trades/export")
+async def export_trades(
+    format: str = "ndjson",
+    ticker: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Stream trades as NDJSON or CSV, reading the table in id-ordered chunks"""
+    if format not in TRADE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(TRADE_FORMATS)}")
+
+    async def chunks():
+        cursor = None
+        first = True
+        while True:
+            page = await run_trade_store_call(
+                trade_store.page, ticker.upper() if ticker else None, status,
+                None, None, "id", TRADE_EXPORT_BATCH_SIZE, cursor
+            )
+            yield encode_trades(page["trades"], format, header=first)
+            first = False
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    return StreamingResponse(
+        chunks(),
+        media_type=TRADE_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=trades.{format}"}
+    )
+
+@app.get("/trades/{trade_id}")
+async def get_trade(trade_id: int):
+    """Fetch a single trade by id"""
+    trade = await run_trade_store_call(trade_store.get, trade_id)
+    if trade is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return {"trade": trade}
 
 @app.put("/trades/{trade_id}")
 async def update_trade(trade_id: int, trade: Trade):
     """Update an existing trade with validation"""
-    if not 0 <= trade_id < len(trade_log):
-        raise HTTPException(status_code=404, detail="Trade not found")
-    
     try:
-        validate_ticker(trade.ticker)
-        trade_log[trade_id] = trade.dict()
-        return {"trade": trade_log[trade_id]}
+        await run_market_data_call(validate_ticker, trade.ticker)
+        updated = await run_trade_store_call(update_trade_record, trade_id, trade.dict())
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating trade: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to update trade: {str(e)}"
         )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return {"trade": updated}
 
 @app.delete("/trades/{trade_id}")
 async def delete_trade(trade_id: int):
     """Delete a trade with validation"""
-    if not 0 <= trade_id < len(trade_log):
-        raise HTTPException(status_code=404, detail="Trade not found")
-    
     try:
-        deleted_trade = trade_log.pop(trade_id)
-        return {"trade": deleted_trade}
+        deleted_trade = await run_trade_store_call(delete_trade_record, trade_id)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting trade: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to delete trade: {str(e)}"
         )
+    if deleted_trade is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return {"trade": deleted_trade}
+
+@app.get("/portfolio/valuation")
+async def portfolio_valuation():
+    """
+    Mark every open trade to market: per-trade (as columns), per-ticker and total
+    unrealized P&L and percentage. Each trade counts as one unit at its entry price;
+    each distinct ticker's latest price is read once from the cached series.
+    """
+    try:
+        trades = await run_trade_store_call(trade_store.open_trades)
+        series, errors = await get_stock_data_many(sorted(set(trades["ticker"])), VALUATION_RANGE)
+        latest = {ticker: float(data["Close"].iloc[-1]) for ticker, data in series.items() if not data.empty}
+        valuation = value_open_trades(trades["id"], trades["ticker"], trades["price"], latest)
+        valuation["errors"] = errors
+        return render_json(valuation)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error valuing portfolio: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to value portfolio: {str(e)}"
+        )
+
+@app.get("/portfolio/realized")
+async def portfolio_realized(method: str = "fifo", ticker: Optional[str] = None):
+    """
+    Realized P&L from matching closed trades against open lots (method=fifo or
+    lifo), in total and per ticker. Each open trade is a one-unit buy and each
+    closed trade a one-unit sell; pending trades are ignored.
+    """
+    try:
+        return await run_trade_store_call(lot_engine.summary, method, ticker.upper() if ticker else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the stock data cache"""
+    return {
+        "stock_data": stock_data_cache.stats(),
+        "stock_data_flights": stock_data_flights.stats(),
+        "resampled": resampled_cache.stats(),
+        "indicators": indicator_cache.stats(),
+        "regression": regression_cache.stats(),
+        "regression_channels": channel_cache.stats(),
+        "forecast_bands": forecast_band_cache.stats(),
+        "compute": compute_pool.stats(),
+        "symbols": symbol_registry.stats(),
+        "market_data": market_data.stats(),
+        "stream_pollers": stream_pollers.stats(),
+        "stream_views": stream_view_cache.stats(),
+        "live_indicators": live_indicators.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "trade_db": trade_db.stats(),
+    }
+
+def build_lot_books() -> None:
+    try:
+        lot_engine.rebuild()
+    except Exception as e:
+        # The first /portfolio/realized query builds the books instead
+        logger.error(f"Could not build lot books: {str(e)}")
+
+@app.on_event("startup")
+async def start_lot_books():
+    # A full replay can outlast TRADE_DB_TIMEOUT, so it runs outside the trade store pool;
+    # writes skip the books until it finishes
+    threading.Thread(target=build_lot_books, name="lot-books", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_market_data():
+    await stream_pollers.shutdown()
+    try:
+        live_indicators.save(INDICATOR_STATE_FILE)
+    except OSError as e:
+        logger.error(f"Could not save live indicators to {INDICATOR_STATE_FILE}: {str(e)}")
+    market_data.shutdown()
+    compute_pool.shutdown()
+    trade_db.shutdown()
+    trade_store.close()
 
 # Health check endpoint
 @app.get("/health")
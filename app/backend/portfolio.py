@@ -0,0 +1,71 @@
+import math
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+
+def _json_floats(values: np.ndarray) -> List[Any]:
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def _json_float(value: float) -> Optional[float]:
+    return float(value) if math.isfinite(value) else None
+
+
+def value_open_trades(ids: List[int], tickers: List[str], entry_prices: List[float],
+                      latest_prices: Mapping[str, float]) -> Dict[str, Any]:
+    """Mark open trades to market in one vectorized pass
+
+    Each trade is one unit bought at its entry price. Tickers are factorized
+    with ``np.unique`` so every distinct symbol's price is looked up once and
+    broadcast back to its trades; per-ticker totals come from ``np.bincount``.
+    Trades whose ticker has no price get null values and are left out of the totals.
+    """
+    entry = np.asarray(entry_prices, dtype=np.float64)
+    symbols, inverse = np.unique(np.asarray(tickers, dtype=object).astype(str), return_inverse=True)
+    symbol_prices = np.array([latest_prices.get(s, np.nan) for s in symbols], dtype=np.float64)
+
+    current = symbol_prices[inverse]
+    pnl = current - entry
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = pnl / entry * 100.0
+
+    priced = np.isfinite(current)
+    counts = np.bincount(inverse, minlength=len(symbols))
+    cost = np.bincount(inverse, weights=np.where(priced, entry, 0.0), minlength=len(symbols))
+    value = np.bincount(inverse, weights=np.where(priced, current, 0.0), minlength=len(symbols))
+
+    # Per-symbol summaries: one entry per distinct ticker, not per trade
+    by_ticker = {}
+    for i, symbol in enumerate(symbols.tolist()):
+        has_price = math.isfinite(symbol_prices[i])
+        ticker_pnl = value[i] - cost[i] if has_price else math.nan
+        by_ticker[symbol] = {
+            "trades": int(counts[i]),
+            "price": _json_float(symbol_prices[i]),
+            "cost": float(cost[i]) if has_price else None,
+            "unrealized_pnl": _json_float(ticker_pnl),
+            "percentage": _json_float(ticker_pnl / cost[i] * 100.0) if has_price and cost[i] else None,
+        }
+
+    total_cost = float(cost.sum())
+    total_pnl = float(value.sum() - total_cost)
+    return {
+        "trades": {
+            "id": list(ids),
+            "ticker": symbols[inverse].tolist(),
+            "entry_price": entry.tolist(),
+            "price": _json_floats(current),
+            "unrealized_pnl": _json_floats(pnl),
+            "percentage": _json_floats(percentage),
+        },
+        "by_ticker": by_ticker,
+        "total": {
+            "trades": len(entry),
+            "priced_trades": int(priced.sum()),
+            "cost": total_cost,
+            "market_value": float(value.sum()),
+            "unrealized_pnl": total_pnl,
+            "percentage": total_pnl / total_cost * 100.0 if total_cost else None,
+        },
+    }
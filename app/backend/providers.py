@@ -0,0 +1,195 @@
+"""Market data providers
+
+Every entry point (the API, the backtests and the Tk prototypes) gets its
+OHLCV data through ``get_provider()`` instead of calling yfinance directly, so
+the source can be switched through configuration:
+
+    TRENDTRADER_PROVIDER=yfinance   live data from Yahoo Finance (default)
+    TRENDTRADER_PROVIDER=local      files under TRENDTRADER_DATA_DIR
+
+The local provider reads ``<data_dir>/<interval>/<TICKER>.csv`` (or
+``.parquet``), falling back to ``<data_dir>/<TICKER>.csv`` for daily bars.
+"""
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+MARKET_TZ = "America/New_York"
+
+
+def period_start(index: pd.DatetimeIndex, period: Optional[str]) -> int:
+    """Position of the first bar covered by a yfinance-style trailing period
+
+    Day periods count trading sessions ("1d" is the latest session), week,
+    month and year periods are calendar offsets from the last bar.
+    """
+    if len(index) == 0 or not period or period == "max":
+        return 0
+
+    last = index[-1]
+    if period == "ytd":
+        return int(index.searchsorted(last.normalize().replace(month=1, day=1)))
+
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        sessions = index.normalize().unique()
+        return int(index.searchsorted(sessions[-min(count, len(sessions))]))
+    offset = {
+        "wk": pd.DateOffset(weeks=count),
+        "mo": pd.DateOffset(months=count),
+        "y": pd.DateOffset(years=count),
+    }[unit]
+    return int(index.searchsorted(last - offset, side="right"))
+
+
+def slice_period(data: pd.DataFrame, period: Optional[str]) -> pd.DataFrame:
+    """Keep the trailing part of a series covered by a yfinance-style period"""
+    return data.iloc[period_start(data.index, period):]
+
+
+class MarketDataProvider(ABC):
+    """Source of OHLCV bars indexed by timestamp"""
+
+    name = "base"
+
+    @abstractmethod
+    def history(self, ticker: str, period: Optional[str] = None, interval: str = "1d",
+                start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Bars for one ticker, either for a trailing period or from start onwards"""
+
+    def download(self, tickers: Iterable[str], period: Optional[str] = "max", interval: str = "1d",
+                 start: Optional[pd.Timestamp] = None) -> Dict[str, pd.DataFrame]:
+        """Bars for several tickers; missing tickers map to an empty frame"""
+        return {t: self.history(t, period=period, interval=interval, start=start) for t in tickers}
+
+    def exists(self, ticker: str) -> bool:
+        return not self.history(ticker, period="5d", interval="1d").empty
+
+    def exists_many(self, tickers: List[str]) -> Dict[str, bool]:
+        frames = self.download(tickers, period="5d", interval="1d")
+        return {t: not frames.get(t, pd.DataFrame()).dropna(how="all").empty for t in tickers}
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance"""
+
+    name = "yfinance"
+
+    def __init__(self):
+        import yfinance as yf
+        self.yf = yf
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        if start is not None:
+            return self.yf.Ticker(ticker).history(start=start, interval=interval)
+        return self.yf.Ticker(ticker).history(period=period or "1mo", interval=interval)
+
+    def download(self, tickers, period="max", interval="1d", start=None):
+        tickers = list(tickers)
+        kwargs = {"start": start} if start is not None else {"period": period}
+        # auto_adjust matches the split/dividend adjusted bars Ticker.history returns
+        data = self.yf.download(tickers, interval=interval, group_by="ticker", auto_adjust=True,
+                                progress=False, **kwargs)
+        if len(tickers) == 1 and not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: data}
+        found = set(data.columns.get_level_values(0)) if not data.empty else set()
+        return {
+            t: data[t].dropna(how="all") if t in found else pd.DataFrame(columns=OHLCV_COLUMNS)
+            for t in tickers
+        }
+
+
+class LocalFileProvider(MarketDataProvider):
+    """OHLCV bars read from CSV or Parquet files on disk
+
+    Parsed files are kept in memory and re-read only when their modification
+    time changes, so repeated reads run at memory speed.
+    """
+
+    name = "local"
+    extensions = (".parquet", ".csv")
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._frames: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, ticker: str, interval: str) -> Optional[str]:
+        candidates = [os.path.join(self.data_dir, interval, ticker.upper() + ext) for ext in self.extensions]
+        if interval == "1d":
+            candidates += [os.path.join(self.data_dir, ticker.upper() + ext) for ext in self.extensions]
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, path: str) -> pd.DataFrame:
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        if path.endswith(".parquet"):
+            data = pd.read_parquet(path)
+        else:
+            data = pd.read_csv(path, index_col=0)
+        index = pd.to_datetime(data.index)
+        if not isinstance(index, pd.DatetimeIndex):
+            # Mixed UTC offsets (e.g. across DST changes) only parse as UTC
+            index = pd.to_datetime(data.index, utc=True)
+        data.index = index.tz_localize(MARKET_TZ) if index.tz is None else index.tz_convert(MARKET_TZ)
+        data.index.name = "Date"
+        data.columns = [c.strip().title() for c in data.columns]
+        data = data.sort_index()
+
+        with self._lock:
+            self._frames[path] = (mtime, data)
+        return data
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        path = self.path_for(ticker, interval)
+        if path is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        data = self._load(path)
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tzinfo is None:
+                start = start.tz_localize(data.index.tz)
+            return data[data.index >= start]
+        return slice_period(data, period)
+
+    def exists(self, ticker):
+        if self.path_for(ticker, "1d") is not None:
+            return True
+        if not os.path.isdir(self.data_dir):
+            return False
+        return any(
+            self.path_for(ticker, entry) is not None
+            for entry in os.listdir(self.data_dir)
+            if os.path.isdir(os.path.join(self.data_dir, entry))
+        )
+
+    def exists_many(self, tickers):
+        return {t: self.exists(t) for t in tickers}
+
+
+def get_provider(name: Optional[str] = None, data_dir: Optional[str] = None) -> MarketDataProvider:
+    """Build the provider selected by arguments or TRENDTRADER_PROVIDER / TRENDTRADER_DATA_DIR"""
+    name = (name or os.environ.get("TRENDTRADER_PROVIDER", "yfinance")).lower()
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "local":
+        data_dir = data_dir or os.environ.get("TRENDTRADER_DATA_DIR")
+        if not data_dir:
+            raise ValueError("TRENDTRADER_DATA_DIR must be set for the local provider")
+        return LocalFileProvider(data_dir)
+    raise ValueError(f"Unknown market data provider: {name}")
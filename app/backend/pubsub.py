@@ -0,0 +1,135 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+
+class Subscription:
+    """One consumer of a key's updates, either through a queue or a callback
+
+    Updates are whole values (e.g. the latest series), so a slow consumer whose
+    queue is full loses only stale updates: the oldest queued one is dropped.
+    """
+
+    def __init__(self, registry: "PollerRegistry", key: Hashable, callback: Optional[Callable[[Any], None]] = None,
+                 maxsize: int = 1):
+        self.registry = registry
+        self.key = key
+        self.callback = callback
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def _deliver(self, value: Any) -> None:
+        if self.callback is not None:
+            self.callback(value)
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(value)
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.registry._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PollerRegistry:
+    """One background polling task per subscribed key, fanned out to every subscriber
+
+    ``poll(key, previous)`` fetches the current value for a key and returns
+    None when nothing changed since ``previous``. Pollers start with the first
+    subscriber, poll immediately and then every ``interval`` seconds, and stop
+    when the last subscriber leaves, so upstream calls scale with distinct keys
+    rather than with consumers. New subscribers get the latest value at once.
+    """
+
+    def __init__(self, poll: Callable[[Hashable, Any], Awaitable[Any]], interval: float,
+                 on_error: Optional[Callable[[Hashable, Exception], None]] = None):
+        self.poll = poll
+        self.interval = interval
+        self.on_error = on_error
+        self._subscribers: Dict[Hashable, Set[Subscription]] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._latest: Dict[Hashable, Any] = {}
+        self.polls = 0
+        self.published = 0
+        self.errors = 0
+
+    def subscribe(self, key: Hashable, callback: Optional[Callable[[Any], None]] = None,
+                  maxsize: int = 1) -> Subscription:
+        """Must be called from the event loop; close the subscription when done"""
+        subscription = Subscription(self, key, callback, maxsize)
+        self._subscribers.setdefault(key, set()).add(subscription)
+        if key in self._latest:
+            subscription._deliver(self._latest[key])
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._run(key))
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.key]
+            self._latest.pop(subscription.key, None)
+            task = self._tasks.pop(subscription.key, None)
+            if task is not None:
+                task.cancel()
+
+    def latest(self, key: Hashable) -> Any:
+        return self._latest.get(key)
+
+    def publish(self, key: Hashable, value: Any) -> None:
+        self._latest[key] = value
+        self.published += 1
+        for subscription in list(self._subscribers.get(key, ())):
+            try:
+                subscription._deliver(value)
+            except Exception as e:
+                self.errors += 1
+                if self.on_error is not None:
+                    self.on_error(key, e)
+
+    async def _run(self, key: Hashable) -> None:
+        while True:
+            self.polls += 1
+            try:
+                value = await self.poll(key, self._latest.get(key))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep polling; a transient upstream failure should not end every stream
+                self.errors += 1
+                value = None
+                if self.on_error is not None:
+                    self.on_error(key, e)
+            if value is not None and key in self._subscribers:
+                self.publish(key, value)
+            await asyncio.sleep(self.interval)
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        self._subscribers.clear()
+        self._latest.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pollers": len(self._tasks),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "polls": self.polls,
+            "published": self.published,
+            "errors": self.errors,
+        }
@@ -0,0 +1,179 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the full burst is available again
+    retry_after: float  # seconds until this request would be allowed (0 when allowed)
+
+    def headers(self, window: float) -> Dict[str, str]:
+        """RateLimit-* headers (IETF draft), plus Retry-After for rejected requests"""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_after)),
+            "RateLimit-Policy": f"{self.limit};w={int(window)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class GCRARateLimiter:
+    """Generic cell rate algorithm: ``limit`` request units per ``window`` seconds
+
+    Each key stores one number, its theoretical arrival time (TAT), so a check
+    is O(1) in time and memory. A key whose TAT has passed has its full burst
+    available again and is indistinguishable from a new key, so idle keys are
+    evicted without changing any decision; ``max_keys`` bounds memory outright.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self.emission_interval = window / limit
+        self._tats: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def check(self, key: Hashable, cost: int = 1) -> RateLimitResult:
+        """Consume cost units for key if they are available"""
+        with self._lock:
+            now = self.clock()
+            self._evict_idle(now)
+            result, new_tat = self._decide(now, self._tats.get(key), cost)
+            if not result.allowed:
+                return result
+
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+                self.evictions += 1
+            return result
+
+    def _decide(self, now: float, tat: Optional[float], cost: int) -> Tuple[RateLimitResult, float]:
+        """The GCRA decision for a key's stored TAT; returns the result and the TAT to store"""
+        tat = now if tat is None else max(tat, now)
+        new_tat = tat + cost * self.emission_interval
+        allow_at = new_tat - self.window
+        if allow_at - now > 1e-9:  # tolerance for float rounding of the interval sums
+            self.rejected += 1
+            return RateLimitResult(False, self.limit, self._remaining(now, tat), tat - now, allow_at - now), tat
+        self.allowed += 1
+        return RateLimitResult(True, self.limit, self._remaining(now, new_tat), new_tat - now, 0.0), new_tat
+
+    def _remaining(self, now: float, tat: float) -> int:
+        return max(0, int((now - (tat - self.window)) / self.emission_interval + 1e-9))
+
+    def _evict_idle(self, now: float) -> None:
+        # Keys are in least-recently-used order; drop fully replenished ones from
+        # the front, stopping at the first key that is still throttled
+        while self._tats:
+            key, tat = next(iter(self._tats.items()))
+            if tat > now:
+                break
+            del self._tats[key]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tats)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "keys": len(self._tats),
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+            }
+
+
+class SharedGCRARateLimiter(GCRARateLimiter):
+    """GCRA limiter whose TATs live in a SQLite database in WAL mode
+
+    Every uvicorn worker on the host opens the same file, so a client gets one
+    limit no matter which worker serves it. A check is a single short
+    ``BEGIN IMMEDIATE`` transaction (one indexed read, one upsert) with
+    ``synchronous=OFF``, which costs microseconds; losing the last few updates
+    on power failure only makes the limiter briefly lenient. TATs use wall
+    clock time because monotonic clocks do not survive a reboot.
+
+    Checks run on the event loop, so a contended lock is waited on for only
+    ``busy_timeout`` seconds; past that ``check`` raises ``sqlite3.OperationalError``
+    and the caller is expected to fail open rather than stall every request.
+    """
+
+    def __init__(self, limit: int, window: float, path: str, sweep_every: int = 1000,
+                 clock: Callable[[], float] = time.time, busy_timeout: float = 0.005):
+        super().__init__(limit, window, clock=clock)
+        self.path = path
+        self.sweep_every = sweep_every
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._checks = 0
+        # Schema setup runs once at startup, off the request path, so it may wait out other workers
+        setup = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        try:
+            setup.execute("PRAGMA journal_mode=WAL")
+            setup.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            setup.execute("CREATE INDEX IF NOT EXISTS rate_limits_tat ON rate_limits (tat)")
+        finally:
+            setup.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly in check()
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def check(self, key: Hashable, cost: int = 1) -> RateLimitResult:
+        conn = self._connection()
+        key = str(key)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            result, new_tat = self._decide(now, row[0] if row else None, cost)
+            if result.allowed:
+                conn.execute(
+                    "INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tat = excluded.tat",
+                    (key, new_tat),
+                )
+            self._checks += 1
+            if self._checks % self.sweep_every == 0:
+                # Fully replenished keys behave exactly like absent ones
+                self.evictions += conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,230 @@
+"""Closed-form least-squares trend lines over price series
+
+The fit of ``y`` against ``x = 0, 1, ..., n - 1`` only needs n, sum(y),
+sum(x*y) and sum(y*y): the x sums have exact closed forms. Slope, intercept
+and RMSE follow in O(1) from those sums, which are extended in O(k) when k
+bars are appended, so a series that grows bar by bar is never refitted from
+scratch.
+"""
+import math
+import threading
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from cache import TTLCache
+
+
+class LinearFit(NamedTuple):
+    slope: float
+    intercept: float
+    rmse: float
+    n: int
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.intercept + self.slope * np.asarray(x, dtype=np.float64)
+
+    def forecast(self, steps: int) -> np.ndarray:
+        """Values of the line for the steps positions after the fitted ones"""
+        return self.predict(np.arange(self.n, self.n + steps))
+
+
+class RunningOLS:
+    """Running sums of a series for the fit against its position"""
+
+    __slots__ = ("n", "shift", "sum_y", "sum_xy", "sum_yy")
+
+    def __init__(self):
+        self.n = 0
+        self.shift = 0.0  # first value; sums are kept over y - shift for precision
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_yy = 0.0
+
+    def copy(self) -> "RunningOLS":
+        other = RunningOLS()
+        other.n, other.shift = self.n, self.shift
+        other.sum_y, other.sum_xy, other.sum_yy = self.sum_y, self.sum_xy, self.sum_yy
+        return other
+
+    def extend(self, values: np.ndarray) -> "RunningOLS":
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        if self.n == 0:
+            self.shift = float(values[0])
+        y = values - self.shift
+        x = np.arange(self.n, self.n + len(y), dtype=np.float64)
+        self.sum_y += float(y.sum())
+        self.sum_xy += float(x @ y)
+        self.sum_yy += float(y @ y)
+        self.n += len(y)
+        return self
+
+    def fit(self) -> LinearFit:
+        n = self.n
+        if n < 2:
+            raise ValueError("Insufficient data points for regression")
+        sum_x = n * (n - 1) / 2
+        sxx = n * (n * n - 1) / 12  # sum of squared deviations of 0..n-1
+        sxy = self.sum_xy - sum_x * self.sum_y / n
+        syy = self.sum_yy - self.sum_y * self.sum_y / n
+        slope = sxy / sxx
+        intercept = self.sum_y / n - slope * sum_x / n + self.shift
+        sse = max(syy - slope * sxy, 0.0)
+        return LinearFit(slope, intercept, math.sqrt(sse / n), n)
+
+
+def fit_line(values: np.ndarray) -> LinearFit:
+    return RunningOLS().extend(values).fit()
+
+
+def rolling_channels(values: np.ndarray, window: int, k: float = 2.0) -> Dict[str, np.ndarray]:
+    """Regression channels over every trailing window of length window
+
+    For the window ending at each bar: the slope, the fitted value at that bar
+    and bands k residual standard deviations around it. Window sums of y, j*y
+    and y*y (j the global position) come from prefix sums, and re-basing j to
+    the window's own 0..window-1 makes every window an O(1) closed-form fit,
+    so the whole series costs O(n). Bars before the first full window are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if window < 2:
+        raise ValueError("window must be at least 2")
+    out = {name: np.full(n, np.nan) for name in ("slope", "fitted", "upper", "lower")}
+    if n < window:
+        return out
+
+    y = values - values[0]  # centered for precision, as in RunningOLS
+    j = np.arange(n, dtype=np.float64)
+
+    def window_sums(series: np.ndarray) -> np.ndarray:
+        csum = np.concatenate(([0.0], np.cumsum(series)))
+        return csum[window:] - csum[:-window]
+
+    sum_y = window_sums(y)
+    sum_jy = window_sums(j * y)
+    sum_yy = window_sums(y * y)
+    offsets = j[:n - window + 1]  # global position of each window's first bar
+
+    sum_x = window * (window - 1) / 2
+    sxx = window * (window * window - 1) / 12
+    sum_xy = sum_jy - offsets * sum_y
+    sxy = sum_xy - sum_x * sum_y / window
+    syy = sum_yy - sum_y * sum_y / window
+    slope = sxy / sxx
+    fitted = sum_y / window + slope * (window - 1 - sum_x / window) + values[0]
+    sigma = np.sqrt(np.maximum(syy - slope * sxy, 0.0) / window)
+
+    out["slope"][window - 1:] = slope
+    out["fitted"][window - 1:] = fitted
+    out["upper"][window - 1:] = fitted + k * sigma
+    out["lower"][window - 1:] = fitted - k * sigma
+    return out
+
+
+def bootstrap_bands(values: np.ndarray, steps: int, resamples: int = 2000, level: float = 0.95,
+                    block: Optional[int] = None, seed: Optional[int] = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Forecast band for the steps positions after the series, by moving-block residual bootstrap
+
+    Each resample adds residual blocks of length block (default n ** (1/3)) to
+    the fitted line, so autocorrelation within a block is kept, and refits.
+    Every resample shares the design 0..n-1, so a refit only needs the sum of
+    its residuals and their dot product with x - mean(x). For a block of
+    residuals starting at s and placed at position p those are window sums,
+    sum(r[s:s+L]) and (p - mean(x)) * sum(r[s:s+L]) + sum(t * r[s+t]), taken
+    from prefix sums; all refits together cost O(resamples * n / block) and
+    no resample is ever materialized. A forecast path is the refitted line
+    plus a contiguous run of residuals, which widens the band with the horizon
+    when residuals are correlated. Returns the lower and upper quantiles per
+    step; the default fixed seed makes bands reproducible for a given series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    fit = fit_line(values)
+    x = np.arange(n, dtype=np.float64)
+    residuals = values - fit.predict(x)
+    block = min(block or max(1, int(round(n ** (1 / 3)))), n)
+    rng = np.random.default_rng(seed)
+
+    blocks = -(-n // block)
+    last = n - (blocks - 1) * block  # the final block is cut short at the end of the series
+    starts = rng.integers(0, n - block + 1, size=(resamples, blocks))
+
+    def moments(length: int) -> Tuple[np.ndarray, np.ndarray]:
+        """For every start s: sum(r[s:s+length]) and sum(t * r[s+t]) over t < length"""
+        def window_sums(series: np.ndarray) -> np.ndarray:
+            csum = np.concatenate(([0.0], np.cumsum(series)))
+            return csum[length:] - csum[:-length]
+        total = window_sums(residuals)
+        return total, window_sums(x * residuals) - x[:len(total)] * total
+
+    full_sum, full_moment = moments(block)
+    last_sum, last_moment = moments(last)
+    offsets = np.arange(blocks) * block - x.mean()  # p - mean(x) per block position
+    head, tail = starts[:, :-1], starts[:, -1]
+    sum_e = full_sum[head].sum(axis=1) + last_sum[tail]
+    sum_ex = ((full_sum[head] * offsets[:-1] + full_moment[head]).sum(axis=1)
+              + last_sum[tail] * offsets[-1] + last_moment[tail])
+
+    # Closed-form refits: the fitted line's own slope plus that of the resampled residuals
+    sxx = n * (n * n - 1) / 12
+    slopes = fit.slope + sum_ex / sxx
+    intercepts = fit.intercept + sum_e / n - (slopes - fit.slope) * x.mean()
+
+    horizon = np.arange(n, n + steps, dtype=np.float64)
+    paths = intercepts[:, None] + slopes[:, None] * horizon
+    # Future noise as contiguous residual runs (wrapping at the end of the series)
+    noise_starts = rng.integers(0, n, size=resamples)
+    paths += residuals[(noise_starts[:, None] + np.arange(steps)) % n]
+
+    tail_pct = (1 - level) / 2 * 100
+    lower, upper = np.percentile(paths, [tail_pct, 100 - tail_pct], axis=0)
+    return lower, upper
+
+
+class RegressionCache:
+    """Fits per series, extended as bars are appended
+
+    For each series key the running sums over every bar but the last are
+    kept, because the last bar may still change while it forms. A later
+    version of the series whose earlier bars are unchanged (same first
+    timestamp, same timestamp at the end of the summed prefix) only adds its
+    new bars; anything else (the window slid, history was rewritten) refits.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 24 * 3600):
+        self.ttl = ttl
+        self._entries = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.extended = 0
+        self.refits = 0
+
+    def fit(self, key: Hashable, timestamps: np.ndarray, values: np.ndarray) -> LinearFit:
+        timestamps = np.asarray(timestamps)
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n < 2:
+            raise ValueError("Insufficient data points for regression")
+
+        with self._lock:
+            entry: Optional[Tuple[int, int, int, RunningOLS]] = self._entries.get(key)
+            if entry is not None:
+                first, count, last, sums = entry
+                if count <= n - 1 and timestamps[0] == first and timestamps[count - 1] == last:
+                    sums = sums.copy().extend(values[count:n - 1])
+                    self.extended += 1
+                else:
+                    entry = None
+            if entry is None:
+                sums = RunningOLS().extend(values[:n - 1])
+                self.refits += 1
+            self._entries.set(key, (timestamps[0], n - 1, timestamps[n - 2], sums), self.ttl)
+
+        return sums.copy().extend(values[n - 1:]).fit()
+
+    def stats(self):
+        stats = self._entries.stats()
+        stats.update(extended=self.extended, refits=self.refits)
+        return stats
@@ -0,0 +1,77 @@
+import re
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLCV_AGGREGATION = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+}
+UNIT_MINUTES = {"m": 1, "h": 60}
+
+
+def parse_interval(interval: str) -> Tuple[int, str]:
+    """Split an interval such as "30m", "4h", "2d" or "1wk" into (count, unit)"""
+    match = re.fullmatch(r"(\d+)(m|h|d|wk|mo)", interval)
+    if match is None or int(match.group(1)) <= 0:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(match.group(1)), match.group(2)
+
+
+def is_intraday(interval: str) -> bool:
+    return parse_interval(interval)[1] in UNIT_MINUTES
+
+
+def interval_minutes(interval: str) -> int:
+    count, unit = parse_interval(interval)
+    if unit not in UNIT_MINUTES:
+        raise ValueError(f"{interval} is not an intraday interval")
+    return count * UNIT_MINUTES[unit]
+
+
+def can_resample(base: str, target: str) -> bool:
+    """Whether bars at target can be built exactly from bars at base"""
+    try:
+        if is_intraday(target):
+            return is_intraday(base) and interval_minutes(target) % interval_minutes(base) == 0
+        # Sessions, weeks and months can be built from any intraday or daily series
+        return is_intraday(base) or base == "1d"
+    except ValueError:
+        return False
+
+
+def resample_ohlcv(data: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Aggregate OHLCV bars into coarser bars of the given interval
+
+    Intraday buckets are anchored to each session's first bar (9:30 for US
+    equities, matching Yahoo's hourly bars), so they never straddle sessions.
+    """
+    if data.empty:
+        return data
+    count, unit = parse_interval(interval)
+    aggregation = {c: how for c, how in OHLCV_AGGREGATION.items() if c in data.columns}
+    data = data[list(aggregation)]
+    index = data.index
+    sessions = index.normalize()
+
+    if unit in UNIT_MINUTES:
+        step = pd.Timedelta(minutes=count * UNIT_MINUTES[unit])
+        session_open = pd.Series(index, index=index).groupby(sessions).transform("min")
+        offsets = (index - pd.DatetimeIndex(session_open)) // step
+        keys = pd.DatetimeIndex(session_open) + offsets * step
+    elif unit == "d":
+        session_number = np.unique(sessions, return_inverse=True)[1]
+        first = pd.Series(sessions, index=index).groupby(session_number // count).transform("min")
+        keys = pd.DatetimeIndex(first)
+    else:
+        freq = f"{count}W-MON" if unit == "wk" else f"{count}MS"
+        resampled = data.resample(freq, label="left", closed="left").agg(aggregation)
+        return resampled.dropna(subset=["Open"])
+
+    resampled = data.groupby(keys).agg(aggregation)
+    resampled.index.name = index.name
+    return resampled.dropna(subset=["Open"])
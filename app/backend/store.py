@@ -0,0 +1,255 @@
+"""Persistent columnar OHLCV store
+
+Bars are kept on disk per ticker and interval as one raw little-endian file
+per column, read back through ``np.memmap``:
+
+    <root>/<interval>/<TICKER>/ts.i8      bar open time, ns since epoch (UTC)
+    <root>/<interval>/<TICKER>/open.f8    ... high.f8, low.f8, close.f8
+    <root>/<interval>/<TICKER>/volume.i8
+
+A refresh only asks the provider for bars from the last complete stored bar
+on and appends them, so the full history is downloaded once per ticker. If
+that refetched bar's close no longer matches the stored one, the provider has
+re-adjusted its history (a split or dividend) and the series is reseeded;
+so is a series whose last bar is older than the provider serves. Writers
+append price columns before the timestamp column and truncate in the
+opposite order; readers use the shortest column, so a crashed or concurrent
+write is never observed half-done.
+"""
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from providers import MARKET_TZ, MarketDataProvider, period_start
+
+COLUMNS = {
+    "Open": ("open.f8", "<f8"),
+    "High": ("high.f8", "<f8"),
+    "Low": ("low.f8", "<f8"),
+    "Close": ("close.f8", "<f8"),
+    "Volume": ("volume.i8", "<i8"),
+}
+TIMESTAMP_FILE = ("ts.i8", "<i8")
+
+# History downloaded the first time a ticker/interval is stored, bounded by
+# how far back Yahoo serves each intraday interval
+SEED_PERIODS = {
+    "1m": "7d",
+    "2m": "60d",
+    "5m": "60d",
+    "15m": "60d",
+    "30m": "60d",
+    "60m": "730d",
+    "90m": "60d",
+    "1h": "730d",
+}
+DEFAULT_SEED_PERIOD = "max"
+# Relative close change of an already stored bar that means history was re-adjusted
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+def _utc_ns(index: pd.Index) -> np.ndarray:
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        # yf.download returns naive dates for daily bars
+        index = index.tz_localize(MARKET_TZ)
+    return index.tz_convert("UTC").asi8.astype("<i8")
+
+
+def _adjusted(data: pd.DataFrame, anchor: Tuple[int, float]) -> bool:
+    """Whether refetched bars disagree with the stored close of the anchor bar"""
+    ts, close = anchor
+    match = _utc_ns(data.index) == ts
+    if not match.any():
+        return False
+    fetched = float(data["Close"].to_numpy()[match][-1])
+    return abs(fetched - close) > ADJUSTMENT_TOLERANCE * abs(close)
+
+
+class OHLCVStore:
+    def __init__(self, root: str, provider: MarketDataProvider, clock: Callable[[], float] = time.time):
+        self.root = root
+        self.provider = provider
+        self.clock = clock
+        self.reseeds = 0
+
+    def _dir(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.root, interval, ticker.upper())
+
+    @contextmanager
+    def _locked(self, path: str, exclusive: bool):
+        """flock the series directory; works across threads and worker processes alike"""
+        with open(os.path.join(path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _length(self, path: str) -> int:
+        sizes = [
+            os.path.getsize(os.path.join(path, name)) // np.dtype(dtype).itemsize
+            if os.path.exists(os.path.join(path, name)) else 0
+            for name, dtype in [TIMESTAMP_FILE, *COLUMNS.values()]
+        ]
+        return min(sizes)
+
+    def _column(self, path: str, name: str, dtype: str, start: int, stop: int) -> np.ndarray:
+        """Copy rows [start, stop) of a column file out of its memory map"""
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        mapped = np.memmap(os.path.join(path, name), dtype=dtype, mode="r", shape=(stop,))
+        values = np.array(mapped[start:])
+        del mapped
+        return values
+
+    def last_timestamp(self, ticker: str, interval: str) -> Optional[pd.Timestamp]:
+        path = self._dir(ticker, interval)
+        if not os.path.isdir(path):
+            return None
+        with self._locked(path, exclusive=False):
+            n = self._length(path)
+            if n == 0:
+                return None
+            name, dtype = TIMESTAMP_FILE
+            last = int(self._column(path, name, dtype, n - 1, n)[0])
+        return pd.Timestamp(last, tz="UTC").tz_convert(MARKET_TZ)
+
+    def _anchor(self, ticker: str, interval: str) -> Optional[Tuple[int, float]]:
+        """Timestamp (ns, UTC) and close of the last stored bar that was complete when
+        written: the one before the last, which may still have been forming"""
+        path = self._dir(ticker, interval)
+        if not os.path.isdir(path):
+            return None
+        with self._locked(path, exclusive=False):
+            n = self._length(path)
+            if n == 0:
+                return None
+            row = max(n - 2, 0)
+            name, dtype = TIMESTAMP_FILE
+            ts = int(self._column(path, name, dtype, row, row + 1)[0])
+            name, dtype = COLUMNS["Close"]
+            close = float(self._column(path, name, dtype, row, row + 1)[0])
+        return ts, close
+
+    def _expired(self, anchor: Tuple[int, float], interval: str) -> bool:
+        """Whether the anchor is older than the provider serves for the interval"""
+        window = SEED_PERIODS.get(interval)
+        if window is None:
+            return False
+        return self.clock() - anchor[0] / 1e9 > int(window.rstrip("d")) * 86400
+
+    def read(self, ticker: str, interval: str, period: Optional[str] = None) -> pd.DataFrame:
+        """Stored bars for the trailing period, sliced straight from the column files"""
+        path = self._dir(ticker, interval)
+        if not os.path.isdir(path):
+            return pd.DataFrame(columns=list(COLUMNS), index=pd.DatetimeIndex([], tz=MARKET_TZ, name="Date"))
+
+        with self._locked(path, exclusive=False):
+            n = self._length(path)
+            name, dtype = TIMESTAMP_FILE
+            index = pd.DatetimeIndex(
+                pd.to_datetime(self._column(path, name, dtype, 0, n), utc=True).tz_convert(MARKET_TZ),
+                name="Date",
+            )
+            start = period_start(index, period)
+            columns = {
+                column: self._column(path, name, dtype, start, n)
+                for column, (name, dtype) in COLUMNS.items()
+            }
+        return pd.DataFrame(columns, index=index[start:])
+
+    def write(self, ticker: str, interval: str, data: pd.DataFrame, replace: bool = False) -> int:
+        """Merge bars into the store, replacing any stored bars at or after the first new one
+        (or every stored bar with replace)"""
+        if data.empty:
+            return 0
+        data = data.sort_index()
+        ts = _utc_ns(data.index)
+
+        path = self._dir(ticker, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._locked(path, exclusive=True):
+            n = self._length(path)
+            name, dtype = TIMESTAMP_FILE
+            keep = int(np.searchsorted(self._column(path, name, dtype, 0, n), ts[0])) if n and not replace else 0
+
+            # Drop the overlapping tail: timestamps first so readers never see a torn row
+            for name, dtype in [TIMESTAMP_FILE, *COLUMNS.values()]:
+                file_path = os.path.join(path, name)
+                with open(file_path, "ab") as f:
+                    f.truncate(keep * np.dtype(dtype).itemsize)
+
+            for column, (name, dtype) in COLUMNS.items():
+                values = data[column].to_numpy()
+                if dtype == "<i8":
+                    values = np.nan_to_num(values.astype("f8"), nan=0.0)
+                with open(os.path.join(path, name), "ab") as f:
+                    f.write(values.astype(dtype).tobytes())
+            name, _ = TIMESTAMP_FILE
+            with open(os.path.join(path, name), "ab") as f:
+                f.write(ts.tobytes())
+        return len(ts)
+
+    def refresh(self, ticker: str, interval: str) -> int:
+        """Fetch bars from the last complete stored one on, reseeding when history was
+        re-adjusted or the gap is older than the provider serves"""
+        anchor = self._anchor(ticker, interval)
+        replace = False
+        if anchor is not None and not self._expired(anchor, interval):
+            try:
+                start = pd.Timestamp(anchor[0], tz="UTC").tz_convert(MARKET_TZ)
+                data = self.provider.history(ticker, interval=interval, start=start)
+            except Exception:
+                data = None  # reseed below
+            if data is not None:
+                if data.empty:
+                    # Upstream errors come back as empty frames; keep what is stored
+                    return 0
+                if not _adjusted(data, anchor):
+                    return self.write(ticker, interval, data)
+                replace = True
+        self.reseeds += anchor is not None
+        data = self.provider.history(ticker, period=SEED_PERIODS.get(interval, DEFAULT_SEED_PERIOD), interval=interval)
+        return self.write(ticker, interval, data, replace=replace)
+
+    def refresh_many(self, tickers: List[str], interval: str) -> Dict[str, int]:
+        """Refresh several tickers with at most two multi-symbol downloads
+
+        Stored tickers share one incremental download starting at the oldest
+        of their anchor bars; tickers not stored yet, stored too long ago or
+        whose history was re-adjusted share one seed download.
+        """
+        anchors = {t: self._anchor(t, interval) for t in tickers}
+        stored = [t for t in tickers if anchors[t] is not None and not self._expired(anchors[t], interval)]
+        seed = [t for t in tickers if t not in stored]
+        replace = set()
+        frames: Dict[str, pd.DataFrame] = {}
+        if stored:
+            start = pd.Timestamp(min(anchors[t][0] for t in stored), tz="UTC").tz_convert(MARKET_TZ)
+            try:
+                frames.update(self.provider.download(stored, interval=interval, start=start))
+            except Exception:
+                seed += stored
+            else:
+                replace = {t for t in stored if t in frames and not frames[t].empty and _adjusted(frames[t], anchors[t])}
+                seed += [t for t in stored if t in replace]
+        if seed:
+            self.reseeds += sum(anchors[t] is not None for t in seed)
+            frames.update(self.provider.download(
+                seed, period=SEED_PERIODS.get(interval, DEFAULT_SEED_PERIOD), interval=interval
+            ))
+        return {t: self.write(t, interval, frames.get(t, pd.DataFrame()), replace=t in replace) for t in tickers}
+
+
+def get_store(provider: MarketDataProvider, root: Optional[str] = None) -> OHLCVStore:
+    """Store rooted at TRENDTRADER_STORE_DIR (default: data/ohlcv next to this module)"""
+    root = root or os.environ.get(
+        "TRENDTRADER_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ohlcv")
+    )
+    return OHLCVStore(root, provider)
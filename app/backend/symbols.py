@@ -0,0 +1,161 @@
+import csv
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from cache import SingleFlight
+
+# Preloaded symbols never expire
+NO_EXPIRY = float("inf")
+
+
+class SymbolRegistry:
+    """In-memory registry of known-good and known-bad ticker symbols
+
+    Lookups are answered from two hash maps (symbol -> expiry time). Unknown or
+    expired symbols are resolved once through ``lookup`` (or ``batch_lookup`` for
+    several symbols at a time) and the answer is cached, including negative
+    answers, so repeated validation never leaves the process.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], bool],
+        batch_lookup: Optional[Callable[[List[str]], Dict[str, bool]]] = None,
+        valid_ttl: float = 24 * 3600,
+        invalid_ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.lookup = lookup
+        self.batch_lookup = batch_lookup
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.clock = clock
+        self._valid: Dict[str, float] = {}
+        self._invalid: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(symbol: str) -> str:
+        return symbol.strip().upper()
+
+    def known(self, symbol: str) -> Optional[bool]:
+        """Return the cached verdict for symbol, or None if it is unknown or expired"""
+        symbol = self.normalize(symbol)
+        now = self.clock()
+        with self._lock:
+            expires_at = self._valid.get(symbol)
+            if expires_at is not None:
+                if now < expires_at:
+                    self.hits += 1
+                    return True
+                del self._valid[symbol]
+            expires_at = self._invalid.get(symbol)
+            if expires_at is not None:
+                if now < expires_at:
+                    self.hits += 1
+                    return False
+                del self._invalid[symbol]
+            self.misses += 1
+        return None
+
+    def mark_valid(self, symbol: str, ttl: Optional[float] = None) -> None:
+        symbol = self.normalize(symbol)
+        with self._lock:
+            self._invalid.pop(symbol, None)
+            self._valid[symbol] = self.clock() + (self.valid_ttl if ttl is None else ttl)
+
+    def mark_invalid(self, symbol: str, ttl: Optional[float] = None) -> None:
+        symbol = self.normalize(symbol)
+        with self._lock:
+            # Preloaded symbols are authoritative and are never flipped to invalid
+            if self._valid.get(symbol) == NO_EXPIRY:
+                return
+            self._valid.pop(symbol, None)
+            self._invalid[symbol] = self.clock() + (self.invalid_ttl if ttl is None else ttl)
+
+    def is_valid(self, symbol: str) -> bool:
+        """Validate one symbol, consulting the upstream lookup only on a cache miss"""
+        symbol = self.normalize(symbol)
+        verdict = self.known(symbol)
+        if verdict is not None:
+            return verdict
+        return self._inflight.do(symbol, lambda: self._resolve(symbol))
+
+    def _resolve(self, symbol: str) -> bool:
+        valid = bool(self.lookup(symbol))
+        self._record(symbol, valid)
+        return valid
+
+    def _record(self, symbol: str, valid: bool) -> None:
+        if valid:
+            self.mark_valid(symbol)
+        else:
+            self.mark_invalid(symbol)
+
+    def validate_many(self, symbols: Iterable[str]) -> Dict[str, bool]:
+        """Validate several symbols, resolving all unknown ones in a single batch lookup"""
+        results: Dict[str, bool] = {}
+        unknown: List[str] = []
+        for symbol in symbols:
+            symbol = self.normalize(symbol)
+            if symbol in results or symbol in unknown:
+                continue
+            verdict = self.known(symbol)
+            if verdict is None:
+                unknown.append(symbol)
+            else:
+                results[symbol] = verdict
+
+        if unknown:
+            if self.batch_lookup is not None:
+                found = self.batch_lookup(unknown)
+                for symbol in unknown:
+                    valid = bool(found.get(symbol, False))
+                    self._record(symbol, valid)
+                    results[symbol] = valid
+            else:
+                for symbol in unknown:
+                    results[symbol] = self.is_valid(symbol)
+        return results
+
+    def preload(self, path: str) -> int:
+        """Bulk-load known-good symbols from a file
+
+        Accepts either one symbol per line or a CSV file whose header has a
+        ``symbol`` (or ``ticker``) column. Returns the number of symbols loaded.
+        """
+        with open(path, newline="") as f:
+            first_line = f.readline()
+            f.seek(0)
+            header = [column.strip().lower() for column in first_line.split(",")]
+            if "symbol" in header or "ticker" in header:
+                column = header.index("symbol" if "symbol" in header else "ticker")
+                reader = csv.reader(f)
+                next(reader)
+                symbols = [row[column] for row in reader if len(row) > column]
+            else:
+                symbols = [line.split(",")[0] for line in f]
+
+        count = 0
+        with self._lock:
+            for symbol in symbols:
+                symbol = self.normalize(symbol)
+                if not symbol or symbol.startswith("#"):
+                    continue
+                self._invalid.pop(symbol, None)
+                self._valid[symbol] = NO_EXPIRY
+                count += 1
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "valid": len(self._valid),
+                "invalid": len(self._invalid),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -5,6 +5,38 @@ from main import app  # Import your FastAPI app from the main file
 
 client = TestClient(app)
 
+def make_bars(closes, start="2024-01-02 09:30", freq="1min"):
+    """Minute OHLCV bars around the given closes"""
+    import pandas as pd
+    index = pd.date_range(start, periods=len(closes), freq=freq, tz="America/New_York")
+    return pd.DataFrame({
+        "Open": [c - 0.2 for c in closes], "High": [c + 0.3 for c in closes],
+        "Low": [c - 0.3 for c in closes], "Close": [float(c) for c in closes],
+        "Volume": [10 * (i + 1) for i in range(len(closes))],
+    }, index=index)
+
+class FakeProvider:
+    """In-memory provider recording every upstream call"""
+
+    def __init__(self, frames):
+        from providers import MarketDataProvider
+
+        class _Provider(MarketDataProvider):
+            def history(inner, ticker, period=None, interval="1d", start=None):
+                self.calls.append(("history", ticker, start))
+                data = self.frames.get(ticker)
+                if data is None:
+                    return make_bars([]).iloc[:0]
+                return data[data.index >= start] if start is not None else data
+
+            def download(inner, tickers, period="max", interval="1d", start=None):
+                self.calls.append(("download", tuple(tickers), start))
+                return {t: self.frames[t] for t in tickers if t in self.frames}
+
+        self.frames = frames
+        self.calls = []
+        self.provider = _Provider()
+
 # Test stock price prediction function
 def test_predict_stock_price():
     # Mock input data: last 5 prices
@@ -94,3 +126,946 @@ def test_opt_out_trade():
     # Check the trade log is empty
     response = client.get("/trade-log")
     assert len(response.json()["trade_log"]) == 0
+
+# Test that a stale entry only evicts itself from the stock data cache
+def test_ttl_cache_per_key_expiry():
+    from cache import TTLCache
+
+    now = [0.0]
+    cache = TTLCache(maxsize=2, clock=lambda: now[0])
+    cache.set(("AAPL", "1d", "1m"), "aapl", ttl=60)
+    cache.set(("MSFT", "1y", "1d"), "msft", ttl=3600)
+
+    now[0] = 120
+    assert cache.get(("AAPL", "1d", "1m")) is None
+    assert cache.get(("MSFT", "1y", "1d")) == "msft"
+
+    cache.set(("TSLA", "1d", "1m"), "tsla", ttl=60)
+    cache.set(("NVDA", "1d", "1m"), "nvda", ttl=60)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["evictions"] == 1
+
+# Test that concurrent misses for the same key share one upstream call
+def test_single_flight_shares_result_and_errors():
+    import threading
+    import time
+    from cache import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "data"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("AAPL", fetch))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == ["data"] * 10
+
+    def failing():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        flight.do("AAPL", failing)
+    assert flight.stats()["in_flight"] == 0
+
+# Test that the symbol registry caches positive and negative lookups
+def test_symbol_registry_caching(tmp_path):
+    from symbols import SymbolRegistry
+
+    lookups = []
+
+    def lookup(symbol):
+        lookups.append(symbol)
+        return symbol != "INVALID"
+
+    def batch_lookup(symbols):
+        lookups.extend(symbols)
+        return {s: s != "INVALID" for s in symbols}
+
+    now = [0.0]
+    registry = SymbolRegistry(lookup, batch_lookup, valid_ttl=100, invalid_ttl=10, clock=lambda: now[0])
+    assert registry.is_valid("aapl")
+    assert not registry.is_valid("INVALID")
+    assert registry.is_valid("AAPL")
+    assert not registry.is_valid("invalid")
+    assert lookups == ["AAPL", "INVALID"]
+
+    now[0] = 20  # negative entry expired, positive one still fresh
+    assert registry.validate_many(["AAPL", "INVALID", "MSFT"]) == {"AAPL": True, "INVALID": False, "MSFT": True}
+    assert lookups == ["AAPL", "INVALID", "INVALID", "MSFT"]
+
+    symbol_file = tmp_path / "symbols.csv"
+    symbol_file.write_text("Symbol,Name\nNVDA,NVIDIA\nTSLA,Tesla\n")
+    assert registry.preload(str(symbol_file)) == 2
+    assert registry.known("tsla") is True
+
+# Test that slow provider calls time out without blocking the event loop
+def test_async_data_access_timeout():
+    import asyncio
+    import time
+    from dataaccess import AsyncDataAccess, DataAccessTimeout
+
+    access = AsyncDataAccess(max_workers=2, timeout=0.05)
+
+    async def scenario():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        with pytest.raises(DataAccessTimeout):
+            await access.run(time.sleep, 0.2)
+        await beat
+        assert ticks == 5
+        assert await access.run(lambda x: x * 2, 21) == 42
+
+    asyncio.run(scenario())
+    assert access.stats()["timeouts"] == 1
+    access.shutdown()
+
+# Test that async waiters share the leader's pool call and that abandoned calls stay pending
+def test_async_single_flight_bounds_pool():
+    import asyncio
+    import time
+    from cache import AsyncSingleFlight
+    from dataaccess import AsyncDataAccess, DataAccessOverloaded, DataAccessTimeout
+
+    access = AsyncDataAccess(max_workers=2, max_pending=2, timeout=0.05)
+    flights = AsyncSingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.02)
+        return "data"
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("AAPL", lambda: access.run(fetch)) for _ in range(200)))
+        assert results == ["data"] * 200
+        assert len(calls) == 1 and access.stats()["rejected"] == 0
+
+        with pytest.raises(DataAccessTimeout):
+            await access.run(time.sleep, 0.3)
+        assert access.stats()["pending"] == 1  # its thread is still sleeping
+        await access.run(time.sleep, 0.01)
+        with pytest.raises(DataAccessOverloaded):
+            await asyncio.gather(access.run(time.sleep, 0.01), access.run(time.sleep, 0.01))
+        await asyncio.sleep(0.35)
+        assert access.stats()["pending"] == 0
+
+    asyncio.run(scenario())
+    assert flights.stats()["in_flight"] == 0
+    access.shutdown()
+
+# Test the offline file-backed provider and trailing period slicing
+def test_local_file_provider(tmp_path):
+    from providers import LocalFileProvider
+
+    (tmp_path / "1d").mkdir()
+    (tmp_path / "1d" / "AAPL.csv").write_text(
+        "Date,Open,High,Low,Close,Volume\n"
+        "2024-01-02,10,11,9,10.5,100\n"
+        "2024-01-03,10.5,12,10,11.5,200\n"
+        "2024-02-05,11.5,13,11,12.5,300\n"
+    )
+    provider = LocalFileProvider(str(tmp_path))
+
+    data = provider.history("aapl", period="1mo", interval="1d")
+    assert data["Close"].tolist() == [12.5]
+    assert len(provider.history("AAPL", period="max", interval="1d")) == 3
+    assert provider.history("AAPL", period="5d", interval="1d")["Volume"].tolist() == [100, 200, 300]
+    assert provider.history("MSFT", period="1mo", interval="1d").empty
+    assert provider.exists_many(["AAPL", "MSFT"]) == {"AAPL": True, "MSFT": False}
+
+# Test that the OHLCV store seeds once and then only appends newer bars
+def test_ohlcv_store_incremental_refresh(tmp_path):
+    from store import OHLCVStore
+
+    bars = make_bars([1.2, 2.2, 3.2, 4.2, 5.2, 6.2])
+    fake = FakeProvider({"AAPL": bars.iloc[:4]})
+    store = OHLCVStore(str(tmp_path), fake.provider, clock=lambda: bars.index[-1].timestamp())
+    assert store.refresh("AAPL", "1m") == 4
+
+    updated = bars.copy()
+    updated.iloc[3, updated.columns.get_loc("Close")] = 4.25  # last bar was still forming
+    fake.frames["AAPL"] = updated
+    # Refetched from the last complete stored bar, which still matches
+    assert store.refresh("AAPL", "1m") == 4
+    assert fake.calls == [("history", "AAPL", None), ("history", "AAPL", bars.index[2])]
+    assert store.reseeds == 0
+
+    data = store.read("AAPL", "1m", "1d")
+    assert data["Close"].tolist() == [1.2, 2.2, 3.2, 4.25, 5.2, 6.2]
+    assert data["Volume"].tolist() == [10, 20, 30, 40, 50, 60]
+    assert store.last_timestamp("AAPL", "1m") == bars.index[-1]
+
+# Test that re-adjusted history and gaps older than the provider serves trigger reseeds
+def test_ohlcv_store_reseeds(tmp_path):
+    from store import OHLCVStore
+
+    bars = make_bars([400.0, 404.0, 408.0, 412.0])
+    now = [bars.index[-1].timestamp()]
+    fake = FakeProvider({"AAPL": bars, "MSFT": bars})
+    store = OHLCVStore(str(tmp_path), fake.provider, clock=lambda: now[0])
+    store.refresh("AAPL", "1m")
+    store.refresh_many(["MSFT"], "1m")
+
+    # 4:1 split: the provider now serves the whole history divided by four
+    split = make_bars([100.0, 101.0, 102.0, 103.0, 104.0])
+    fake.frames.update(AAPL=split, MSFT=split)
+    store.refresh("AAPL", "1m")
+    store.refresh_many(["MSFT"], "1m")
+    for ticker in ("AAPL", "MSFT"):
+        assert store.read(ticker, "1m")["Close"].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+    assert store.reseeds == 2
+
+    # An empty incremental answer (throttling) keeps the stored series
+    fake.frames["AAPL"] = split.iloc[:0]
+    assert store.refresh("AAPL", "1m") == 0
+    assert len(store.read("AAPL", "1m")) == 5
+
+    # Eight days later 1m bars can only be seeded again
+    fake.frames["AAPL"] = split
+    now[0] += 8 * 86400
+    calls = len(fake.calls)
+    store.refresh("AAPL", "1m")
+    assert fake.calls[calls:] == [("history", "AAPL", None)]
+    assert store.reseeds == 3
+
+# Test that coarse bars are aggregated from a fine-grained base series
+def test_resample_ohlcv_session_anchored():
+    import pandas as pd
+    from resample import can_resample, resample_ohlcv
+
+    index = pd.date_range("2024-01-02 09:30", periods=10, freq="1min", tz="America/New_York")
+    bars = pd.DataFrame({
+        "Open": range(10), "High": [x + 1 for x in range(10)], "Low": [x - 1 for x in range(10)],
+        "Close": [x + 0.5 for x in range(10)], "Volume": [100] * 10,
+    }, index=index, dtype=float)
+
+    five = resample_ohlcv(bars, "5m")
+    assert list(five.index) == [index[0], index[5]]
+    assert five.iloc[0].tolist() == [0, 5, -1, 4.5, 500]
+    assert five.iloc[1].tolist() == [5, 10, 4, 9.5, 500]
+
+    daily = resample_ohlcv(bars, "1d")
+    assert daily.iloc[0].tolist() == [0, 10, -1, 9.5, 1000]
+
+    assert can_resample("1m", "2m") and can_resample("15m", "4h") and can_resample("1d", "1wk")
+    assert not can_resample("5m", "7m") and not can_resample("1d", "4h") and not can_resample("1m", "bad")
+
+# Test that batch misses are served by a single multi-symbol download
+def test_stock_data_batch_single_download(tmp_path, monkeypatch):
+    import main
+    from store import OHLCVStore
+    from symbols import SymbolRegistry
+
+    fake = FakeProvider({
+        "AAPL": make_bars([100 + i for i in range(12)], freq="5min"),
+        "MSFT": make_bars([300 + i for i in range(12)], freq="5min"),
+    })
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(
+        lookup=lambda s: s != "NOPE", batch_lookup=lambda symbols: {s: s != "NOPE" for s in symbols}
+    ))
+    main.stock_data_cache.clear()
+
+    params = {"tickers": "aapl,MSFT,NOPE", "range": "5d", "interval": "15m"}
+    response = client.get("/stock-data/batch", params=params)
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["data"]) == {"AAPL", "MSFT"}
+    assert body["data"]["AAPL"]["prices"] == [102.0, 105.0, 108.0, 111.0]
+    assert "NOPE" in body["errors"]
+    assert fake.calls == [("download", ("AAPL", "MSFT", "NOPE"), None)]
+
+    # Everything is cached now: no further upstream calls
+    client.get("/stock-data/batch", params={**params, "tickers": "AAPL,MSFT"})
+    assert len(fake.calls) == 1
+
+# Test that empty fetches are not negative-cached: only the symbol lookup marks tickers invalid
+def test_empty_fetch_does_not_blacklist_ticker(tmp_path, monkeypatch):
+    import main
+    from store import OHLCVStore
+    from symbols import SymbolRegistry
+
+    fake = FakeProvider({})  # every fetch comes back empty, as when Yahoo throttles
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(
+        lookup=lambda s: s != "NOPE", batch_lookup=lambda symbols: {s: s != "NOPE" for s in symbols}
+    ))
+    main.stock_data_cache.clear()
+
+    params = {"range": "5d", "interval": "5m"}
+    for _ in range(2):
+        assert client.get("/stock-data", params={**params, "ticker": "NEWCO"}).status_code == 404
+        assert client.get("/stock-data", params={**params, "ticker": "NOPE"}).status_code == 400
+    assert main.symbol_registry.known("NEWCO") is True
+
+    fake.frames["NEWCO"] = make_bars([10 + i for i in range(12)], freq="5min")
+    assert client.get("/stock-data", params={**params, "ticker": "NEWCO"}).status_code == 200
+
+    errors = client.get("/stock-data/batch", params={**params, "tickers": "LATER,NOPE"}).json()["errors"]
+    assert errors["LATER"].startswith("No data found") and errors["NOPE"].startswith("Invalid ticker")
+
+# Test that a watchlist larger than the old 32-entry cache is downloaded only once
+def test_stock_data_batch_watchlist_stays_cached(tmp_path, monkeypatch):
+    import main
+    from store import OHLCVStore
+
+    tickers = [f"T{i:02d}" for i in range(40)]
+    fake = FakeProvider({t: make_bars([100 + i for i in range(12)], freq="5min") for t in tickers})
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    main.stock_data_cache.clear()
+
+    assert main.STOCK_CACHE_SIZE > main.MAX_BATCH_TICKERS
+    params = {"tickers": ",".join(tickers), "range": "5d", "interval": "15m"}
+    for _ in range(3):
+        response = client.get("/stock-data/batch", params=params)
+        assert response.status_code == 200 and len(response.json()["data"]) == 40
+    assert len(fake.calls) == 1
+
+# Test the vectorized indicators against straightforward pandas versions
+def test_indicators_match_pandas():
+    import numpy as np
+    import pandas as pd
+    from indicators import bollinger, macd, rsi, sma, stochastic, williams_r
+
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, 300))
+    high, low = close + rng.uniform(0, 1, 300), close - rng.uniform(0, 1, 300)
+    series = pd.Series(close)
+
+    np.testing.assert_allclose(sma(close, 20), series.rolling(20).mean(), equal_nan=True)
+    bands = bollinger(close, 20, 2)
+    expected_upper = series.rolling(20).mean() + 2 * series.rolling(20).std()
+    np.testing.assert_allclose(bands["upper"], expected_upper, equal_nan=True)
+
+    lines = macd(close)
+    expected_macd = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    np.testing.assert_allclose(lines["macd"], expected_macd)
+
+    values = rsi(close, 14)
+    assert np.isnan(values[:14]).all() and ((values[14:] >= 0) & (values[14:] <= 100)).all()
+
+    lowest, highest = pd.Series(low).rolling(14).min(), pd.Series(high).rolling(14).max()
+    np.testing.assert_allclose(stochastic(high, low, close, 14), 100 * (series - lowest) / (highest - lowest), equal_nan=True)
+    np.testing.assert_allclose(williams_r(high, low, close, 14), -100 * (highest - series) / (highest - lowest), equal_nan=True)
+
+# Test that cached indicators follow updates to the bar still forming
+def test_indicators_follow_forming_bar(monkeypatch):
+    import main
+    from symbols import SymbolRegistry
+
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(lookup=lambda s: True))
+    bars = make_bars([100 + i for i in range(30)])
+    main.stock_data_cache.set(("AAPL", "1d", "1m"), bars, 60)
+    params = {"ticker": "AAPL", "range": "1d", "interval": "1m", "indicators": "sma", "sma_period": 5}
+    assert client.get("/indicators", params=params).json()["indicators"]["sma"]["values"][-1] == 127.0
+
+    forming = bars.copy()
+    forming.iloc[-1, forming.columns.get_loc("Close")] = 134.0
+    main.stock_data_cache.set(("AAPL", "1d", "1m"), forming, 60)
+    assert client.get("/indicators", params=params).json()["indicators"]["sma"]["values"][-1] == 128.0
+    main.stock_data_cache.clear()
+
+# Test that streaming indicators match the vectorized ones and survive a restart
+def test_incremental_indicators_match_vectorized():
+    import json
+    import numpy as np
+    from incremental import IndicatorSet
+    from indicators import bollinger, macd, rsi, sma, williams_r
+
+    rng = np.random.default_rng(1)
+    close = 100 + np.cumsum(rng.normal(0, 1, 200))
+    high, low = close + 0.5, close - 0.5
+    params = {"sma": {"period": 20}, "macd": {}, "rsi": {"period": 14},
+              "bollinger": {"period": 20}, "williams_r": {"period": 14}}
+
+    live = IndicatorSet.from_params(params)
+    for i in range(150):
+        live.update(close[i], high[i], low[i], timestamp=i)
+    live.update(close[150] * 2, timestamp=150, closed=False)  # still-forming bar, later revised
+    restored = IndicatorSet.from_state(json.loads(json.dumps(live.to_state())))
+    assert restored.last_timestamp == 149
+    for i in range(150, 200):
+        values = restored.update(close[i], high[i], low[i], timestamp=i)
+
+    assert np.isclose(values["sma"], sma(close, 20)[-1])
+    assert np.isclose(values["macd"]["signal"], macd(close)["signal"][-1])
+    assert np.isclose(values["rsi"], rsi(close, 14)[-1])
+    assert np.isclose(values["bollinger"]["upper"], bollinger(close, 20)["upper"][-1])
+    assert np.isclose(values["williams_r"], williams_r(high, low, close, 14)[-1])
+
+# Test live indicator sets shared by several streams and restored after a restart
+def test_live_indicators_feed_and_persist(tmp_path):
+    import numpy as np
+    from incremental import LiveIndicators
+    from indicators import rsi, sma
+
+    rng = np.random.default_rng(2)
+    close = 100 + np.cumsum(rng.normal(0, 1, 120))
+    bars = [(i * 60, float(c), float(c) + 0.5, float(c) - 0.5) for i, c in enumerate(close)]
+    params = {"sma": {"period": 20}, "rsi": {"period": 14}}
+
+    live = LiveIndicators()
+    stream = live.get(("AAPL", "1d", "1m"), params)
+    stream.feed(bars[:80])
+    # A second stream of the same series shares the set; repeated bars are not counted twice
+    assert live.get(("AAPL", "1d", "1m"), params) is stream
+    values = stream.feed(bars[70:81])
+    assert values[70 * 60] is not None and stream.last_timestamp == 80 * 60
+
+    path = str(tmp_path / "indicators.json")
+    live.save(path)
+    restarted = LiveIndicators()
+    assert restarted.load(path) == 1
+    resumed = restarted.get(("AAPL", "1d", "1m"), params)
+    assert resumed.last_timestamp == 79 * 60  # the forming bar is not persisted
+    values = resumed.feed(bars[60:], forming=False)
+    assert np.isclose(values[119 * 60]["sma"], sma(close, 20)[-1])
+    assert np.isclose(values[119 * 60]["rsi"], rsi(close, 14)[-1])
+
+# Test that columnar negotiation honours q-values in the Accept header
+def test_accepts_columnar_q_values():
+    from columnar import MEDIA_TYPE, accepts_columnar
+
+    assert accepts_columnar(MEDIA_TYPE)
+    assert accepts_columnar(f"{MEDIA_TYPE}, application/json;q=0.5")
+    assert accepts_columnar(f"application/json;q=0.8, {MEDIA_TYPE};q=0.9, */*;q=0.1")
+    assert not accepts_columnar(None)
+    assert not accepts_columnar("*/*")
+    assert not accepts_columnar(f"{MEDIA_TYPE};q=0")
+    assert not accepts_columnar(f"{MEDIA_TYPE};q=0.0, */*")
+    assert not accepts_columnar(f"application/json, {MEDIA_TYPE};q=0.5")
+    assert not accepts_columnar(f"{MEDIA_TYPE}-v2")
+
+# Test that the binary columnar encoding carries the same values as the JSON response
+def test_stock_data_columnar_matches_json():
+    import numpy as np
+    from columnar import decode_columns
+    from main import build_stock_data_columnar, build_stock_data_response
+
+    data = make_bars([100 + (i % 7) for i in range(50)])
+    expected = build_stock_data_response(data, show_regression=True)
+    columns = decode_columns(build_stock_data_columnar(data, show_regression=True))
+
+    assert list(columns) == ["timestamps", "prices", "regression_data", "volume", "error_margin"]
+    assert columns["timestamps"].tolist() == expected.timestamps
+    assert columns["prices"].tolist() == expected.prices
+    assert columns["volume"].tolist() == expected.volume
+    np.testing.assert_allclose(columns["regression_data"], expected.regression_data)
+    assert columns["error_margin"][0] == pytest.approx(expected.error_margin)
+
+# Test that the direct JSON path is byte-for-byte identical to the pydantic response
+def test_stock_data_fast_json_matches_pydantic():
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from main import build_stock_data_response, render_json, stock_data_fields
+
+    data = make_bars([100 + (i % 7) * 0.37 for i in range(50)])
+    for show_regression in (False, True):
+        legacy = JSONResponse(jsonable_encoder(build_stock_data_response(data, show_regression))).body
+        assert render_json(stock_data_fields(data, show_regression)).body == legacy
+
+# Test since= delta fetches and ETag revalidation on /stock-data
+def test_stock_data_since_and_etag(tmp_path, monkeypatch):
+    import main
+    from store import OHLCVStore
+    from symbols import SymbolRegistry
+
+    fake = FakeProvider({"AAPL": make_bars([100 + i for i in range(12)], freq="5min")})
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(lookup=lambda s: True))
+    main.stock_data_cache.clear()
+
+    params = {"ticker": "AAPL", "range": "5d", "interval": "5m"}
+    full = client.get("/stock-data", params=params)
+    assert full.status_code == 200 and len(full.json()["timestamps"]) == 12
+    assert "Last-Modified" in full.headers
+
+    last = full.json()["timestamps"][-1]
+    delta = client.get("/stock-data", params={**params, "since": last})
+    assert delta.json()["timestamps"] == [last] and delta.json()["prices"] == [111.0]
+
+    unchanged = client.get("/stock-data", params=params, headers={"If-None-Match": full.headers["ETag"]})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert delta.headers["ETag"] != full.headers["ETag"]
+
+# Test that streams of one ticker at different intervals share one upstream poller
+def test_stream_pollers_shared_across_intervals(tmp_path, monkeypatch):
+    import asyncio
+    import main
+    from pubsub import PollerRegistry
+    from store import OHLCVStore
+
+    fake = FakeProvider({"AAPL": make_bars([100 + i for i in range(30)])})
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    registry = PollerRegistry(main.poll_stream_series, interval=60)
+    assert main.stream_key("AAPL", "1d") == ("AAPL", "1m")
+
+    async def scenario():
+        subscriptions = [registry.subscribe(main.stream_key("AAPL", "1d")) for _ in ("1m", "5m")]
+        values = [await subscription.get() for subscription in subscriptions]
+        assert registry.stats()["pollers"] == 1
+        await registry.shutdown()
+        return values
+
+    minute, five = asyncio.run(scenario())
+    assert len(fake.calls) == 1
+    assert minute is five
+    assert len(main.stream_series(minute, "AAPL", "1d", "1m")) == 30
+    view = main.stream_series(five, "AAPL", "1d", "5m")
+    assert view["Close"].tolist() == [104.0, 109.0, 114.0, 119.0, 124.0, 129.0]
+    assert main.stream_series(minute, "AAPL", "1d", "5m") is view
+
+# Test that a polled base series holds only the longest range built on it
+def test_stream_base_series_reads_longest_range(tmp_path, monkeypatch):
+    import pandas as pd
+    import main
+    from store import OHLCVStore
+
+    bars = pd.concat([make_bars([100, 101], start="2024-01-02 09:30"), make_bars([102, 103], start="2024-01-03 09:30")])
+    fake = FakeProvider({"AAPL": bars})
+    monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path), fake.provider))
+    assert [main.longest_range(base) for base in ("1m", "5m", "15m", "1d")] == ["1d", "5d", "1mo", "1y"]
+    assert main.refresh_base_series("AAPL", "1m")["Close"].tolist() == [102.0, 103.0]
+
+# Test that resampled series are reused per base series version and counted honestly
+def test_resample_cached_by_series_version():
+    import main
+
+    main.resampled_cache.clear()
+    before = main.resampled_cache.stats()
+    bars = make_bars([100 + i for i in range(30)])
+    five = main.resample_cached("AAPL", "1d", "5m", bars)
+    assert main.resample_cached("AAPL", "1d", "5m", bars.copy()) is five
+
+    forming = bars.copy()
+    forming.iloc[-1, forming.columns.get_loc("Close")] = 140.0
+    assert main.resample_cached("AAPL", "1d", "5m", forming)["Close"].iloc[-1] == 140.0
+    stats = main.resampled_cache.stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+
+# Test that live streams only send new bars and updates to the forming bar
+def test_stream_changed_bars():
+    from main import changed_bars, sse_message
+
+    data = make_bars([100, 101, 102])
+    first = changed_bars(data, None)
+    assert [bar["price"] for bar in first] == [100.0, 101.0, 102.0]
+    assert changed_bars(data, first[-1]) == []
+
+    updated = make_bars([100, 101, 102.5, 103])
+    assert [bar["price"] for bar in changed_bars(updated, first[-1])] == [102.5, 103.0]
+    assert sse_message("bar", first[0]).startswith('event: bar\ndata: {"timestamp":')
+
+# Test that subscribers of one key share a single poller that stops with the last one
+def test_poller_registry_fan_out():
+    import asyncio
+    from pubsub import PollerRegistry
+
+    async def scenario():
+        calls = []
+
+        async def poll(key, previous):
+            calls.append(key)
+            return (previous or 0) + 1
+
+        registry = PollerRegistry(poll, interval=0.01)
+        first = registry.subscribe(("TSLA", "1d", "1m"))
+        second = registry.subscribe(("TSLA", "1d", "1m"))
+        seen = []
+        callback = registry.subscribe(("TSLA", "1d", "1m"), callback=seen.append)
+        assert await first.get() == 1 and await second.get() == 1
+        await asyncio.sleep(0.05)
+        assert registry.stats()["pollers"] == 1 and seen[:2] == [1, 2]
+        assert len(calls) == registry.stats()["polls"]
+
+        for subscription in (first, second, callback):
+            subscription.close()
+        await asyncio.sleep(0)
+        polls = len(calls)
+        await asyncio.sleep(0.03)
+        assert registry.stats()["pollers"] == 0 and len(calls) == polls
+
+    asyncio.run(scenario())
+
+# Test GCRA limits, per-request costs and idle-key eviction
+def test_gcra_rate_limiter():
+    from ratelimit import GCRARateLimiter
+
+    now = [0.0]
+    limiter = GCRARateLimiter(100, 60, max_keys=2, clock=lambda: now[0])
+    results = [limiter.check("a") for _ in range(101)]
+    assert sum(r.allowed for r in results) == 100
+    assert results[-1].remaining == 0 and results[-1].headers(60)["Retry-After"] == "1"
+
+    now[0] = 0.6  # one emission interval later exactly one more request fits
+    assert limiter.check("a").allowed and not limiter.check("a").allowed
+    assert limiter.check("b", cost=5).remaining == 95
+
+    now[0] = 120.0  # both keys fully replenished: dropped on the next check
+    limiter.check("c")
+    assert len(limiter) == 1
+
+# Test that limiters opened on the same database share one limit
+def test_shared_rate_limiter_across_workers(tmp_path):
+    from ratelimit import SharedGCRARateLimiter
+
+    now = [1000.0]
+    path = str(tmp_path / "ratelimit.db")
+    workers = [SharedGCRARateLimiter(10, 60, path, clock=lambda: now[0]) for _ in range(3)]
+    results = [workers[i % 3].check("10.0.0.1") for i in range(12)]
+    assert sum(r.allowed for r in results) == 10
+    assert results[-1].headers(60)["RateLimit-Remaining"] == "0"
+
+    now[0] += 6.0
+    assert workers[1].check("10.0.0.1").allowed
+
+# Test that a locked shared limiter gives up quickly instead of stalling the loop
+def test_shared_rate_limiter_lock_fails_fast(tmp_path):
+    import sqlite3
+    import time
+    from ratelimit import SharedGCRARateLimiter
+
+    path = str(tmp_path / "ratelimit.db")
+    limiter = SharedGCRARateLimiter(10, 60, path)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    start = time.monotonic()
+    try:
+        limiter.check("10.0.0.1")
+        assert False, "expected the locked database to raise"
+    except sqlite3.OperationalError:
+        pass
+    assert time.monotonic() - start < 1.0
+    holder.execute("ROLLBACK")
+    assert limiter.check("10.0.0.1").allowed
+
+# Test that trade ids stay stable across deletes and restarts
+def test_trade_store_stable_ids(tmp_path):
+    from datetime import datetime
+    from trades import TradeStore
+
+    path = str(tmp_path / "trades.db")
+    store = TradeStore(path, pool_size=2)
+    trade = {"ticker": "AAPL", "price": 150.0, "time": datetime(2024, 12, 10, 14, 45), "status": "open", "percentage": 0.0}
+    ids = [store.create({**trade, "price": 150.0 + i})["id"] for i in range(3)]
+
+    assert store.delete(ids[0])["price"] == 150.0
+    assert store.get(ids[0]) is None and store.delete(ids[0]) is None
+    assert store.get(ids[2])["price"] == 152.0
+    assert store.update(ids[1], {**trade, "status": "closed"})["status"] == "closed"
+    assert store.update(999, trade) is None
+    store.close()
+
+    reopened = TradeStore(path)
+    assert [t["id"] for t in reopened.list()] == ids[1:]
+    assert reopened.create(trade)["id"] == ids[2] + 1
+    assert reopened.get(ids[1])["time"] == "2024-12-10T14:45:00+00:00"
+
+# Test that trade times with different UTC offsets sort, filter and match chronologically
+def test_trade_store_times_in_utc(tmp_path):
+    from lots import LotEngine
+    from trades import TradeStore
+
+    store = TradeStore(str(tmp_path / "trades.db"), pool_size=1)
+    late_open = store.create({"ticker": "AAPL", "price": 100.0, "time": "2024-01-02T09:00:00-05:00",
+                              "status": "open", "percentage": 0.0})
+    early_close = store.create({"ticker": "AAPL", "price": 110.0, "time": "2024-01-02T10:00:00+00:00",
+                                "status": "closed", "percentage": 0.0})
+    assert late_open["time"] == "2024-01-02T14:00:00+00:00"
+
+    page = store.page(sort="time")
+    assert [t["id"] for t in page["trades"]] == [early_close["id"], late_open["id"]]
+    window = store.page(start="2024-01-02T08:30:00-05:00", end="2024-01-02T13:45:00")
+    assert [t["id"] for t in window["trades"]] == []
+
+    # The close came before any open lot existed
+    summary = LotEngine(store.iter_trades).summary("fifo", "AAPL")
+    assert summary["realized_pnl"] == 0.0
+    assert summary["by_ticker"]["AAPL"]["unmatched_closes"] == 1
+
+# Test keyset pagination with filters, descending time order and field selection
+def test_trade_store_cursor_pagination(tmp_path):
+    from trades import TradeStore
+
+    store = TradeStore(str(tmp_path / "trades.db"), pool_size=1)
+    for i in range(25):
+        store.create({"ticker": "AAPL" if i % 2 else "MSFT", "price": 100.0 + i,
+                      "time": f"2024-01-{i + 1:02d}T10:00:00", "status": "open", "percentage": 0.0})
+
+    seen, cursor = [], None
+    while True:
+        page = store.page(ticker="AAPL", sort="-time", limit=5, cursor=cursor, fields=["price"])
+        seen += [t["price"] for t in page["trades"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [100.0 + i for i in range(23, 0, -2)]
+    assert list(page["trades"][0]) == ["price"]
+
+    window = store.page(start="2024-01-10T00:00:00", end="2024-01-12T23:59:59")
+    assert [t["price"] for t in window["trades"]] == [109.0, 110.0, 111.0]
+    with pytest.raises(ValueError):
+        store.page(sort="-id", cursor=cursor or store.page(limit=1)["next_cursor"])
+
+# Test streaming NDJSON/CSV trade import with per-row errors, and export
+def test_trade_bulk_import_export(tmp_path, monkeypatch):
+    import json
+    import main
+    from symbols import SymbolRegistry
+    from trades import TradeStore
+
+    monkeypatch.setattr(main, "trade_store", TradeStore(str(tmp_path / "trades.db")))
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(
+        lookup=lambda s: s != "NOPE", batch_lookup=lambda symbols: {s: s != "NOPE" for s in symbols}
+    ))
+
+    rows = [
+        {"ticker": "aapl", "price": 150, "time": "2024-12-10T14:45:00", "status": "open"},
+        {"ticker": "AAPL", "price": -1, "time": "2024-12-10T14:46:00"},
+        {"ticker": "NOPE", "price": 10, "time": "2024-12-10T14:47:00"},
+    ]
+    body = "\n".join(json.dumps(r) for r in rows) + "\nnot json\n"
+    report = client.post("/trades/import", content=body, headers={"Content-Type": "application/x-ndjson"}).json()
+    assert report["imported"] == 1 and report["failed"] == 3
+    assert [e["line"] for e in report["errors"]] == [2, 3, 4]
+
+    csv_body = "ticker,price,time,status\nMSFT,300,2024-12-11T10:00:00,closed\n"
+    report = client.post("/trades/import", content=csv_body, headers={"Content-Type": "text/csv"}).json()
+    assert report == {"imported": 1, "failed": 0, "errors": []}
+
+    exported = client.get("/trades/export", params={"format": "csv"})
+    assert exported.headers["content-type"].startswith("text/csv")
+    lines = exported.text.strip().split("\n")
+    assert lines[0] == "id,ticker,price,time,status,percentage"
+    assert [line.split(",")[1] for line in lines[1:]] == ["AAPL", "MSFT"]
+
+# Test that lot books pick up trades written by another worker process
+def test_lot_engine_sees_other_workers(tmp_path):
+    from lots import LotEngine
+    from trades import TradeStore
+
+    path = str(tmp_path / "trades.db")
+    workers = [TradeStore(path, pool_size=1) for _ in range(2)]
+    engines = [LotEngine(store.iter_trades, store.versions) for store in workers]
+
+    def add(worker, price, day, status):
+        trade = workers[worker].create({"ticker": "AAPL", "price": price, "time": f"2024-01-{day:02d}T10:00:00",
+                                        "status": status, "percentage": 0.0})
+        engines[worker].record(trade)
+
+    add(0, 100.0, 1, "open")
+    assert engines[1].summary("fifo")["by_ticker"]["AAPL"]["open_lots"] == 1
+    add(1, 120.0, 2, "closed")
+    assert engines[0].summary("fifo")["realized_pnl"] == 20.0
+    assert engines[1].summary("fifo")["realized_pnl"] == 20.0
+
+    # A worker's own in-order writes need no replay
+    replays = engines[1].replays
+    add(1, 110.0, 3, "open")
+    assert engines[1].summary("fifo")["by_ticker"]["AAPL"]["open_lots"] == 1
+    assert engines[1].replays == replays
+
+# Test that writes never build the lot books, and that trades written meanwhile are counted
+def test_lot_engine_writes_skip_unbuilt_books(tmp_path):
+    from lots import LotEngine
+    from trades import TradeStore
+
+    store = TradeStore(str(tmp_path / "trades.db"), pool_size=1)
+    reads = []
+
+    def iter_trades(ticker=None):
+        reads.append(ticker)
+        if reads == [None]:
+            add(120.0, 2, "closed")  # another request writes while the books are being built
+        return store.iter_trades(ticker)
+
+    engine = LotEngine(iter_trades)
+
+    def add(price, day, status):
+        trade = store.create({"ticker": "AAPL", "price": price, "time": f"2024-01-{day:02d}T10:00:00",
+                              "status": status, "percentage": 0.0})
+        engine.record(trade)
+
+    add(100.0, 1, "open")
+    engine.invalidate("AAPL")
+    assert reads == [] and engine.replays == 0
+
+    assert engine.summary("fifo")["realized_pnl"] == 20.0
+    assert reads == [None, "AAPL"]
+    add(130.0, 3, "open")
+    assert engine.summary("fifo")["by_ticker"]["AAPL"]["open_lots"] == 1
+    assert engine.replays == 1
+
+# Test vectorized mark-to-market of open trades
+def test_value_open_trades():
+    from portfolio import value_open_trades
+
+    valuation = value_open_trades(
+        [1, 2, 3, 4], ["AAPL", "MSFT", "AAPL", "GONE"], [100.0, 200.0, 120.0, 50.0],
+        {"AAPL": 110.0, "MSFT": 190.0},
+    )
+    trades = valuation["trades"]
+    assert trades["price"] == [110.0, 190.0, 110.0, None]
+    assert trades["unrealized_pnl"] == [10.0, -10.0, -10.0, None]
+    assert trades["percentage"][:2] == [10.0, -5.0]
+    assert valuation["by_ticker"]["AAPL"]["unrealized_pnl"] == 0.0
+    assert valuation["by_ticker"]["GONE"]["price"] is None
+    assert valuation["total"]["cost"] == 420.0 and valuation["total"]["unrealized_pnl"] == -10.0
+    assert valuation["total"]["priced_trades"] == 3
+
+# Test FIFO/LIFO realized P&L with in-order, back-dated and deleted trades
+def test_lot_engine_realized_pnl(tmp_path):
+    from lots import LotEngine
+    from trades import TradeStore
+
+    store = TradeStore(str(tmp_path / "trades.db"), pool_size=1)
+    engine = LotEngine(store.iter_trades)
+
+    def add(price, day, status):
+        trade = store.create({"ticker": "AAPL", "price": price, "time": f"2024-01-{day:02d}T10:00:00",
+                              "status": status, "percentage": 0.0})
+        engine.record(trade)
+        return trade
+
+    add(100.0, 1, "open")
+    add(110.0, 2, "open")
+    add(120.0, 3, "closed")
+    assert engine.summary("fifo")["realized_pnl"] == 20.0
+    assert engine.summary("lifo")["realized_pnl"] == 10.0
+    assert engine.replays == 0
+
+    # A back-dated buy changes which lot the sale matched: only AAPL is replayed
+    early = add(90.0, 1, "open")
+    assert engine.replays == 1
+    assert engine.summary("fifo")["realized_pnl"] == 20.0
+    assert engine.summary("fifo", "AAPL")["by_ticker"]["AAPL"]["open_lots"] == 2
+
+    store.delete(early["id"])
+    engine.invalidate("AAPL")
+    add(130.0, 4, "closed")
+    add(140.0, 5, "closed")
+    summary = engine.summary("lifo")
+    assert summary["realized_pnl"] == 10.0 + 30.0
+    assert summary["by_ticker"]["AAPL"]["unmatched_closes"] == 1
+
+    fresh = LotEngine(store.iter_trades)
+    assert fresh.summary("lifo") == summary
+
+# Test closed-form regression against polyfit, and incremental extension of cached fits
+def test_regression_closed_form_and_cache():
+    import numpy as np
+    from regression import RegressionCache, fit_line
+
+    rng = np.random.default_rng(3)
+    prices = 1000 + np.cumsum(rng.normal(0, 1, 500))
+    slope, intercept = np.polyfit(np.arange(500), prices, 1)
+    fit = fit_line(prices)
+    assert fit.slope == pytest.approx(slope) and fit.intercept == pytest.approx(intercept)
+    residuals = prices - (intercept + slope * np.arange(500))
+    assert fit.rmse == pytest.approx(np.sqrt(np.mean(residuals ** 2)))
+    np.testing.assert_allclose(fit.forecast(3), intercept + slope * np.arange(500, 503))
+
+    cache = RegressionCache()
+    timestamps = np.arange(500) * 60
+    cache.fit("AAPL", timestamps[:400], prices[:400])
+    revised = prices.copy()
+    revised[399] += 5  # the bar that was still forming when first fitted
+    extended = cache.fit("AAPL", timestamps, revised)
+    assert cache.extended == 1 and cache.refits == 1
+    assert extended.slope == pytest.approx(fit_line(revised).slope)
+    cache.fit("AAPL", timestamps[1:], revised[1:])  # window slid: refit
+    assert cache.refits == 2
+
+# Test prefix-sum rolling regression channels against a per-window polyfit
+def test_rolling_regression_channels():
+    import numpy as np
+    from regression import rolling_channels
+
+    rng = np.random.default_rng(3)
+    prices = 150 + np.cumsum(rng.normal(0, 1, 300))
+    window, k = 20, 2.0
+    channels = rolling_channels(prices, window, k)
+    assert np.isnan(channels["fitted"][:window - 1]).all()
+    x = np.arange(window)
+    for end in (window - 1, 150, 299):
+        y = prices[end - window + 1:end + 1]
+        slope, intercept = np.polyfit(x, y, 1)
+        fitted = intercept + slope * (window - 1)
+        sigma = np.sqrt(np.mean((y - (intercept + slope * x)) ** 2))
+        assert channels["slope"][end] == pytest.approx(slope)
+        assert channels["fitted"][end] == pytest.approx(fitted)
+        assert channels["upper"][end] == pytest.approx(fitted + k * sigma)
+        assert channels["lower"][end] == pytest.approx(fitted - k * sigma)
+    assert np.isnan(rolling_channels(prices[:5], window)["fitted"]).all()
+
+# Test that cached regression channels follow updates to the bar still forming
+def test_regression_channels_follow_forming_bar(monkeypatch):
+    import main
+    from regression import rolling_channels
+    from symbols import SymbolRegistry
+
+    monkeypatch.setattr(main, "symbol_registry", SymbolRegistry(lookup=lambda s: True))
+    bars = make_bars([100 + i for i in range(30)])
+    main.stock_data_cache.set(("AAPL", "1d", "1m"), bars, 60)
+    params = {"ticker": "AAPL", "range": "1d", "interval": "1m", "window": 5}
+    assert client.get("/regression-channels", params=params).json()["fitted"][-1] == pytest.approx(129.0)
+
+    forming = bars.copy()
+    forming.iloc[-1, forming.columns.get_loc("Close")] = 134.0
+    main.stock_data_cache.set(("AAPL", "1d", "1m"), forming, 60)
+    expected = rolling_channels(forming["Close"].to_numpy(), 5)["fitted"][-1]
+    assert client.get("/regression-channels", params=params).json()["fitted"][-1] == pytest.approx(expected)
+    main.stock_data_cache.clear()
+
+# Test block-bootstrap forecast bands around the regression forecast
+def test_bootstrap_forecast_bands():
+    import asyncio
+    import numpy as np
+    import main
+    from main import stock_data_fields
+    from regression import bootstrap_bands, fit_line
+
+    rng = np.random.default_rng(5)
+    trend = 100 + 0.5 * np.arange(400)
+    quiet = trend + rng.normal(0, 1, 400)
+    noisy = trend + rng.normal(0, 5, 400)
+
+    lower, upper = bootstrap_bands(quiet, 10)
+    forecast = fit_line(quiet).forecast(10)
+    assert lower.shape == upper.shape == (10,)
+    assert (lower < forecast).all() and (forecast < upper).all()
+    # About +/- 1.96 sigma for white noise
+    assert np.mean(upper - lower) == pytest.approx(2 * 1.96, rel=0.25)
+    np.testing.assert_array_equal(bootstrap_bands(quiet, 10)[0], lower)
+    noisy_lower, noisy_upper = bootstrap_bands(noisy, 10)
+    assert np.mean(noisy_upper - noisy_lower) > 3 * np.mean(upper - lower)
+
+    # Bands are computed once per series version, off the event loop
+    data = make_bars([100 + (i % 7) for i in range(50)])
+    main.forecast_band_cache.clear()
+    hits = main.forecast_band_cache.stats()["hits"]
+    bands = asyncio.run(main.get_forecast_bands(("AAPL", "1d", "1m"), data))
+    assert asyncio.run(main.get_forecast_bands(("AAPL", "1d", "1m"), data)) is bands
+    assert main.forecast_band_cache.stats()["hits"] == hits + 1
+    fields = stock_data_fields(data, show_regression=True, forecast_bands=bands)
+    assert len(fields["forecast_lower"]) == len(fields["regression_data"]) == 10
+    assert stock_data_fields(data, show_regression=True)["forecast_lower"] is None
@@ -0,0 +1,295 @@
+"""Durable trade log on SQLite
+
+Trades get stable ``INTEGER PRIMARY KEY AUTOINCREMENT`` ids, so deleting one
+never renumbers the others and ids are never reused. Point lookups, updates
+and deletes go through the primary key, and ticker, status and time have
+their own indexes. Connections come from a small pool and the database runs
+in WAL mode, so readers never wait for a writer.
+"""
+import base64
+import csv
+import io
+import json
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TRADE_FIELDS = ("ticker", "price", "time", "status", "percentage")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticker TEXT NOT NULL,
+        price REAL NOT NULL,
+        time TEXT NOT NULL,
+        status TEXT NOT NULL,
+        percentage REAL NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS trades_ticker ON trades (ticker, id)",
+    "CREATE INDEX IF NOT EXISTS trades_status ON trades (status, id)",
+    "CREATE INDEX IF NOT EXISTS trades_time ON trades (time, id)",
+    # Filter + time order, so a filtered page sorted by time is one index range scan
+    "CREATE INDEX IF NOT EXISTS trades_ticker_time ON trades (ticker, time, id)",
+    "CREATE INDEX IF NOT EXISTS trades_status_time ON trades (status, time, id)",
+    # Per-ticker change counters, bumped by every write from any process, so
+    # in-memory views of the log (e.g. the lot books) can tell when they are stale
+    "CREATE TABLE IF NOT EXISTS trade_versions (ticker TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+    """CREATE TRIGGER IF NOT EXISTS trades_version_insert AFTER INSERT ON trades BEGIN
+        INSERT INTO trade_versions (ticker, version) VALUES (NEW.ticker, 1)
+        ON CONFLICT(ticker) DO UPDATE SET version = version + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trades_version_update AFTER UPDATE ON trades BEGIN
+        INSERT INTO trade_versions (ticker, version) VALUES (OLD.ticker, 1)
+        ON CONFLICT(ticker) DO UPDATE SET version = version + 1;
+        INSERT INTO trade_versions (ticker, version) VALUES (NEW.ticker, 1)
+        ON CONFLICT(ticker) DO UPDATE SET version = version + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trades_version_delete AFTER DELETE ON trades BEGIN
+        INSERT INTO trade_versions (ticker, version) VALUES (OLD.ticker, 1)
+        ON CONFLICT(ticker) DO UPDATE SET version = version + 1;
+    END""",
+]
+SORTABLE = ("id", "time")
+MAX_PAGE_SIZE = 1000
+# Bulk import/export formats and their media types
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def encode_cursor(sort: str, row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor: the sort key of the last row returned"""
+    key = [sort, row[sort.lstrip("-")], row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    try:
+        cursor_sort, value, trade_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, int(trade_id)
+
+
+def _row(row: sqlite3.Row) -> Dict[str, Any]:
+    return dict(row)
+
+
+def utc_time(value: Any) -> str:
+    """ISO 8601 text in UTC for a datetime or ISO string; naive times are taken as UTC
+
+    All stored times share the +00:00 offset, so their text sorts (and range
+    filters compare) chronologically.
+    """
+    if not isinstance(value, datetime):
+        text = str(value)
+        value = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith("Z") else text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _values(trade: Dict[str, Any]) -> List[Any]:
+    values = [trade[field] for field in TRADE_FIELDS]
+    values[2] = utc_time(values[2])
+    return values
+
+
+class TradeStore:
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            # Times written before they were normalized to UTC
+            legacy = conn.execute("SELECT id, time FROM trades WHERE time NOT LIKE '%+00:00'").fetchall()
+            conn.executemany("UPDATE trades SET time = ? WHERE id = ?", [(utc_time(t), i) for i, t in legacy])
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; the block runs as one transaction"""
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def create(self, trade: Dict[str, Any]) -> Dict[str, Any]:
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO trades ({', '.join(TRADE_FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+                _values(trade),
+            )
+            return self._get(conn, cursor.lastrowid)
+
+    def get(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        with self.connection() as conn:
+            return self._get(conn, trade_id)
+
+    def _get(self, conn: sqlite3.Connection, trade_id: int) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT * FROM trades WHERE id = ?", (trade_id,)).fetchone()
+        return _row(row) if row is not None else None
+
+    def update(self, trade_id: int, trade: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Replace a trade; returns None if the id does not exist"""
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"UPDATE trades SET {', '.join(f'{field} = ?' for field in TRADE_FIELDS)} WHERE id = ?",
+                [*_values(trade), trade_id],
+            )
+            return self._get(conn, trade_id) if cursor.rowcount else None
+
+    def create_many(self, trades: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch of trades in one transaction; returns them as stored"""
+        if not trades:
+            return []
+        with self.connection() as conn:
+            query = f"INSERT INTO trades ({', '.join(TRADE_FIELDS)}) VALUES (?, ?, ?, ?, ?)"
+            ids = [conn.execute(query, _values(trade)).lastrowid for trade in trades]
+            rows = conn.execute("SELECT * FROM trades WHERE id BETWEEN ? AND ? ORDER BY id", (ids[0], ids[-1]))
+            return [_row(row) for row in rows]
+
+    def delete(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        """Remove a trade and return it; None if the id does not exist"""
+        with self.connection() as conn:
+            trade = self._get(conn, trade_id)
+            if trade is not None:
+                conn.execute("DELETE FROM trades WHERE id = ?", (trade_id,))
+            return trade
+
+    def page(self, ticker: Optional[str] = None, status: Optional[str] = None,
+             start: Optional[str] = None, end: Optional[str] = None, sort: str = "id",
+             limit: int = 100, cursor: Optional[str] = None,
+             fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """One page of trades in keyset order: every page is an index range scan
+        starting after the cursor, so its cost does not grow with the offset
+
+        sort is "id" or "time", prefixed with "-" for descending order; start
+        and end bound the trade time (inclusive, ISO 8601; naive times are UTC).
+        """
+        column = sort.lstrip("-")
+        if column not in SORTABLE:
+            raise ValueError(f"sort must be one of {list(SORTABLE)}, optionally prefixed with '-'")
+        fields = list(fields or ("id", *TRADE_FIELDS))
+        unknown = [f for f in fields if f not in ("id", *TRADE_FIELDS)]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        where, params = [], []
+        start = utc_time(start) if start is not None else None
+        end = utc_time(end) if end is not None else None
+        for condition, value in (("ticker = ?", ticker), ("status = ?", status),
+                                 ("time >= ?", start), ("time <= ?", end)):
+            if value is not None:
+                where.append(condition)
+                params.append(value)
+        direction, op = ("DESC", "<") if sort.startswith("-") else ("ASC", ">")
+        if cursor is not None:
+            value, last_id = decode_cursor(cursor, sort)
+            if column == "id":
+                where.append(f"id {op} ?")
+                params.append(last_id)
+            else:
+                where.append(f"({column}, id) {op} (?, ?)")
+                params.extend([value, last_id])
+
+        # The cursor needs the sort key, even when it was not asked for
+        selected = list(dict.fromkeys([*fields, "id", column]))
+        order = f"id {direction}" if column == "id" else f"{column} {direction}, id {direction}"
+        query = f"SELECT {', '.join(selected)} FROM trades"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {order} LIMIT ?"
+        with self.connection() as conn:
+            rows = [_row(row) for row in conn.execute(query, [*params, limit + 1])]
+
+        next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+        return {
+            "trades": [{f: row[f] for f in fields} for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }
+
+    def open_trades(self) -> Dict[str, List[Any]]:
+        """id, ticker and price of every open trade as parallel columns (served by the status index)"""
+        with self.connection() as conn:
+            rows = conn.execute("SELECT id, ticker, price FROM trades WHERE status = 'open' ORDER BY id").fetchall()
+        ids, tickers, prices = zip(*rows) if rows else ((), (), ())
+        return {"id": list(ids), "ticker": list(tickers), "price": list(prices)}
+
+    def iter_trades(self, ticker: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream trades in (time, id) order, optionally for one ticker, without loading them all"""
+        query = "SELECT id, ticker, price, time, status FROM trades"
+        params: List[Any] = []
+        if ticker is not None:
+            query += " WHERE ticker = ?"
+            params.append(ticker)
+        with self.connection() as conn:
+            for row in conn.execute(query + " ORDER BY time, id", params):
+                yield _row(row)
+
+    def versions(self) -> Dict[str, int]:
+        """Change counter per ticker; any write to a ticker's trades, by any process, bumps it"""
+        with self.connection() as conn:
+            return dict(conn.execute("SELECT ticker, version FROM trade_versions").fetchall())
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            return [_row(row) for row in conn.execute("SELECT * FROM trades ORDER BY id")]
+
+    def count(self) -> int:
+        with self.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def get_trade_store(path: Optional[str] = None, pool_size: int = 4) -> TradeStore:
+    """Store at TRENDTRADER_TRADE_DB (default: data/trades.db next to this module)"""
+    path = path or os.environ.get(
+        "TRENDTRADER_TRADE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trades.db")
+    )
+    return TradeStore(path, pool_size)
+
+
+def encode_trades(trades: List[Dict[str, Any]], fmt: str, header: bool = False) -> str:
+    """Serialize a batch of trades as NDJSON lines or CSV rows"""
+    if fmt == "ndjson":
+        return "".join(json.dumps(trade, separators=(",", ":")) + "\n" for trade in trades)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(("id", *TRADE_FIELDS))
+    writer.writerows([trade[f] for f in ("id", *TRADE_FIELDS)] for trade in trades)
+    return out.getvalue()
+
+
+def decode_trade(line: str, fmt: str, header: Optional[List[str]]) -> Dict[str, Any]:
+    """Parse one NDJSON or CSV line into a trade record; empty CSV cells are left out"""
+    if fmt == "ndjson":
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+        return record
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    return {name: value for name, value in zip(header, values) if value != "" and name != "id"}
@@ -61,71 +61,38 @@ export const useStockChart = () => {
     }
   };
 
-  const calculateSMA = (data, period) => {
-    const sma = [];
-    for (let i = period - 1; i < data.length; i++) {
-      const sum = data.slice(i - period + 1, i + 1).reduce((acc, price) => acc + price, 0);
-      sma.push(sum / period);
-    }
-    return sma;
-  };
-
-  const calculateEMA = (data, period) => {
-    const ema = [];
-    const k = 2 / (period + 1);
-    ema.push(data[0]);
-
-    for (let i = 1; i < data.length; i++) {
-      const value = (data[i] - ema[i - 1]) * k + ema[i - 1];
-      ema.push(value);
-    }
-    return ema;
-  };
-
-  const calculateMACD = (data) => {
-    const ema12 = calculateEMA(data, 12);
-    const ema26 = calculateEMA(data, 26);
-    const macd = ema12.slice(26 - 1).map((value, index) => value - ema26[index]);
-    const signal = calculateEMA(macd, 9);
-    return { macd, signal };
-  };
-
-  const calculateRSI = (data, period = 14) => {
-    let gains = 0;
-    let losses = 0;
-    const rsi = [];
-
-    for (let i = 1; i <= period; i++) {
-      const change = data[i] - data[i - 1];
-      if (change > 0) gains += change;
-      if (change < 0) losses -= change;
-    }
-    rsi.push(100 - (100 / (1 + (gains / losses))));
-
-    for (let i = period; i < data.length; i++) {
-      const change = data[i] - data[i - 1];
-      gains = change > 0 ? change : 0;
-      losses = change < 0 ? -change : 0;
-
-      const avgGain = (gains + (gains * (period - 1))) / period;
-      const avgLoss = (losses + (losses * (period - 1))) / period;
+  const fetchIndicators = async () => {
+    try {
+      const response = await axios.get("http://127.0.0.1:8000/indicators", {
+        params: {
+          ticker,
+          range,
+          interval,
+          indicators: "sma,ema,macd,rsi",
+          sma_period: smaPeriod,
+          ema_period: emaPeriod,
+        },
+      });
 
-      const rs = avgGain / avgLoss;
-      rsi.push(100 - (100 / (1 + rs)));
+      const { sma, ema, macd, rsi } = response.data.indicators;
+      setSmaData(sma.values);
+      setEmaData(ema.values);
+      setMacdData({
+        macd: normalizeData(macd.values.macd),
+        signal: normalizeData(macd.values.signal),
+      });
+      // Map RSI from [0, 100] onto the shared [-1, 1] axis
+      setRsiData(rsi.values.map((value) => (value === null ? null : value / 50 - 1)));
+    } catch (error) {
+      console.error("Error fetching indicators:", error);
     }
-
-    return rsi.map(value => 2 * ((value - 0) / (100 - 0)) - 1);
-  };
-
-  const padData = (data, length) => {
-    const padding = new Array(length - data.length).fill(null);
-    return [...padding, ...data];
   };
 
   const normalizeData = (data) => {
-    const min = Math.min(...data);
-    const max = Math.max(...data);
-    return data.map((value) => (2 * (value - min)) / (max - min) - 1);
+    const values = data.filter((value) => value !== null);
+    const min = Math.min(...values);
+    const max = Math.max(...values);
+    return data.map((value) => (value === null ? null : (2 * (value - min)) / (max - min) - 1));
   };
 
   const handleAddTrade = () => {
@@ -151,25 +118,9 @@ export const useStockChart = () => {
 
   useEffect(() => {
     if (data.length > 0) {
-      if (showSMA) {
-        setSmaData(calculateSMA(data, smaPeriod));
-      }
-      if (showEMA) {
-        setEmaData(calculateEMA(data, emaPeriod));
-      }
-
-      const { macd, signal} = calculateMACD(data);
-      const normalizedMacd = normalizeData(macd);
-      const normalizedSignal = normalizeData(signal);
-      const normalizedRsi = calculateRSI(data);
-
-      setMacdData({
-        macd: padData(normalizedMacd, data.length),
-        signal: padData(normalizedSignal, data.length)
-      });
-      setRsiData(padData(normalizedRsi, data.length));
+      fetchIndicators();
     }
-  }, [data, showSMA, showEMA, smaPeriod, emaPeriod]);
+  }, [data, smaPeriod, emaPeriod]);
 
   return {
     ticker,
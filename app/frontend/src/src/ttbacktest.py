@@ -1,4 +1,5 @@
-import yfinance as yf
+import os
+import sys
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
@@ -8,8 +9,20 @@ from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.metrics import accuracy_score
 import matplotlib.pyplot as plt
 
+# Market data comes from the backend's configurable provider (TRENDTRADER_PROVIDER)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'backend'))
+from providers import get_provider
+from store import get_store
+
+provider = get_provider()
+store = get_store(provider)
+
 def get_stock_data(ticker):
-    stock_data = yf.download(ticker)
+    # Daily bars come from the local store, which only downloads bars it does not have yet
+    store.refresh(ticker, '1d')
+    stock_data = store.read(ticker, '1d')
+    # Stored bars are already split/dividend adjusted
+    stock_data['Adj Close'] = stock_data['Close']
     stock_data['12_day_ema'] = stock_data['Close'].ewm(span=12, min_periods=12).mean()
     stock_data['26_day_ema'] = stock_data['Close'].ewm(span=26, min_periods=26).mean()
     stock_data['MACD'] = stock_data['12_day_ema'] - stock_data['26_day_ema']
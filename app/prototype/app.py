@@ -1,3 +1,5 @@
+import os
+import sys
 import time
 import psutil
 import tkinter as tk
@@ -5,12 +7,18 @@ from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-import yfinance as yf
 import pandas as pd
 import tkinter.font as tkFont
 from sklearn.linear_model import LinearRegression
 import matplotlib.dates as mdates
 
+# Market data comes from the backend's configurable provider (TRENDTRADER_PROVIDER)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from providers import get_provider
+from regression import rolling_channels
+
+provider = get_provider()
+
 class StockApp:
     def __init__(self, root):
         self.root = root
@@ -116,6 +124,10 @@ class StockApp:
         self.regression_button = ttk.Button(self.side_frame, text="Linear Regression", command=self.plot_linear_regression, style="TButton")
         self.regression_button.pack(pady=10)
 
+        # Rolling Regression Channel Button
+        self.channel_button = ttk.Button(self.side_frame, text="Regression Channel", command=self.plot_regression_channel, style="TButton")
+        self.channel_button.pack(pady=10)
+
         # Create matplotlib figure and canvas for the graph
         self.fig, self.ax1 = plt.subplots(figsize=(10, 4))
         self.canvas = FigureCanvasTkAgg(self.fig, master=root)
@@ -154,7 +166,7 @@ class StockApp:
             initial_memory = psutil.virtual_memory().percent
             # Fetch stock data
             try:
-                data = yf.download(ticker, period=self.period_var.get(), interval='1d')
+                data = provider.download([ticker], period=self.period_var.get(), interval='1d')[ticker]
                 if data.empty:
                     print("No data found for this ticker.")
                     return
@@ -341,7 +353,7 @@ class StockApp:
     def plot_linear_regression(self):
         """ Plot linear regression line on the graph. """
         ticker = self.ticker_entry.get().strip().upper()
-        data = yf.download(ticker, period=self.period_var.get(), interval='1d')
+        data = provider.download([ticker], period=self.period_var.get(), interval='1d')[ticker]
         
         if data.empty:
             print("No data found for linear regression.")
@@ -356,6 +368,22 @@ class StockApp:
         # Refresh graph to show linear regression
         self.canvas.draw()
 
+    def plot_regression_channel(self, window=20, k=2.0):
+        """ Plot the rolling regression channel (fitted line and +/- k sigma bands) on the graph. """
+        ticker = self.ticker_entry.get().strip().upper()
+        data = provider.download([ticker], period=self.period_var.get(), interval='1d')[ticker]
+
+        if len(data) < window:
+            print("Not enough data for a regression channel.")
+            return
+
+        channel = rolling_channels(data['Close'].to_numpy(), window, k)
+        self.ax1.plot(data.index, channel['fitted'], label=f'Regression Channel ({window})', color='orange', linewidth=1)
+        self.ax1.fill_between(data.index, channel['lower'], channel['upper'], color='orange', alpha=0.15)
+
+        # Refresh graph to show the channel
+        self.canvas.draw()
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = StockApp(root)
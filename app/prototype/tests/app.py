@@ -1,13 +1,20 @@
+import os
+import sys
 
 import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-import yfinance as yf
 import pandas as pd
 import tkinter.font as tkFont
 
+# Market data comes from the backend's configurable provider (TRENDTRADER_PROVIDER)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend'))
+from providers import get_provider
+
+provider = get_provider()
+
 
 class StockApp:
     def __init__(self, root):
@@ -151,7 +158,7 @@ class StockApp:
         if ticker:
             # Fetch stock data
             try:
-                data = yf.download(ticker, period=self.period_var.get(), interval='1d')
+                data = provider.download([ticker], period=self.period_var.get(), interval='1d')[ticker]
                 if data.empty:
                     print("No data found for this ticker.")
                     return
@@ -1,5 +1,6 @@
+import os
+import sys
 import tkinter.font as tkFont
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
@@ -10,6 +11,12 @@ import time
 import numpy as np
 from sklearn.linear_model import LinearRegression
 
+# Market data comes from the backend's configurable provider (TRENDTRADER_PROVIDER)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend'))
+from providers import get_provider
+
+provider = get_provider()
+
 class StockApp:
     def __init__(self, root):
         self.root = root
@@ -100,8 +107,7 @@ class StockApp:
 
     def fetch_stock_data(self, ticker, period):
         try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period=period)
+            data = provider.history(ticker, period=period)
             if data.empty:
                 raise ValueError("No data available for the specified ticker and period.")
             return data